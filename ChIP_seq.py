@@ -1,5 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from scipy.stats import norm
 
 import random
 
@@ -47,7 +48,8 @@ def create_reference_genome_chip(
         genome_length (int): Total length of the reference genome.
         binding_site_length (int): Length of each binding site motif.
         ideal_site_locations (list[int]): Start positions to insert ideal (perfect match) binding sites.
-        good_site_locations (list[int]): Start positions to insert good (imperfect match) binding sites.
+        good_site_locations (list[int]): Start positions to insert good (imperfect match) binding sites,
+                                         each a separately mutated copy of the ideal site.
 
     Returns:
         tuple[np.ndarray, np.ndarray]: 
@@ -58,14 +60,15 @@ def create_reference_genome_chip(
     
     nucleotides = ["A", "T", "G", "C"]
     ideal_binding_site = np.random.choice(nucleotides, binding_site_length)
-    mutations = np.random.choice(nucleotides, 3)
-    good_binding_site = np.copy(ideal_binding_site)
-    for i in range(3):
-        base_location = np.random.randint(0, binding_site_length)
-        good_binding_site[base_location] = mutations[i]
     
     reference_genome = np.random.choice(["A", "T", "G", "C"], genome_length)
     for i in good_site_locations:
+        # Each good site is its own variant of the ideal site
+        good_binding_site = np.copy(ideal_binding_site)
+        mutations = np.random.choice(nucleotides, 3)
+        for m in range(3):
+            base_location = np.random.randint(0, binding_site_length)
+            good_binding_site[base_location] = mutations[m]
         reference_genome[i:i + binding_site_length] = good_binding_site
     for i in ideal_site_locations:
         reference_genome[i:i + binding_site_length] = ideal_binding_site
@@ -77,7 +80,8 @@ def create_reads_chip(
     reference_genome: np.ndarray,
     binding_site: np.ndarray,
     binding_site_length: int,
-    antibody_specificity: int = 4
+    antibody_specificity: int = 4,
+    affinities: np.ndarray = None
 ) -> np.ndarray:
     """
     Simulate ChIP-seq reads based on binding site similarity and antibody specificity.
@@ -89,33 +93,30 @@ def create_reads_chip(
         antibody_specificity (int): Integer from 1 (poor) to 4 (best), indicating how selective the antibody is.
                                     Higher values produce sharper peaks centered on perfect binding sites.
                                     Typical dropdown menu labels: [1 → "poor", 2 → "good", 3 → "better", 4 → "best"]
+        affinities (np.ndarray): Optional per-position binding probabilities, e.g. from
+                                 motif_scanning.affinity_track. Replaces the exact-match count
+                                 against binding_site.
 
     Returns:
         np.ndarray: Read coverage map with jittered alignment counts per position.
     """
 
     genome_length = len(reference_genome)
+    rng = np.random.default_rng()
 
     # Map affinities
-    affinities = []
-    for i in range(genome_length - binding_site_length):
-        affinity = (reference_genome[i:i+binding_site_length] == binding_site).sum()
-        affinities.append(affinity)
-
-    raw_affinities = np.array(affinities)
-    normalized_affinities = raw_affinities / binding_site_length
+    if affinities is None:
+        windows = np.lib.stride_tricks.sliding_window_view(reference_genome, binding_site_length)[:genome_length - binding_site_length]
+        raw_affinities = (windows == binding_site).sum(axis=1)
+        normalized_affinities = raw_affinities / binding_site_length
+    else:
+        normalized_affinities = np.asarray(affinities, dtype=float)[:genome_length - binding_site_length]
     soft_affinities = np.clip(normalized_affinities, a_min=0.05, a_max=None)
     
-    # Create reads
+    # Create reads: each of num_reads fragments binds each position with probability affinity_freq
     num_reads = 100
-    reads_per_position = []
     affinity_freq = soft_affinities ** antibody_specificity
-    for i in range(genome_length - binding_site_length):
-        affinity = np.array([affinity_freq[i] for _ in range(num_reads)])
-        reads = (np.random.random(num_reads) < affinity).sum()
-        reads_per_position.append(reads)
-
-    reads_per_position = np.array(reads_per_position)
+    reads_per_position = rng.binomial(num_reads, affinity_freq)
 
     # Jitter reads
     k = 9  # spread, aka number of buckets
@@ -125,16 +126,18 @@ def create_reads_chip(
     sigma = k / 6  # adjust spread; ~99.7% of values within [0, k-1]
     len_norm_rpp = len(reads_per_position) + 2 * ends
     jittered_rpp = np.zeros(len_norm_rpp, dtype=int)
-    
-    for i in range(len(reads_per_position)):
-        samples = np.random.normal(loc=mu, scale=sigma, size=reads_per_position[i])
-        buckets, _ = np.histogram(samples, bins=np.arange(k + 1))
-        jittered_rpp[i:i+k] += buckets
+
+    # Normally distributed offsets, binned into k buckets; offsets outside [0, k) are dropped
+    bucket_probs = np.diff(norm.cdf(np.arange(k + 1), loc=mu, scale=sigma))
+    bucket_probs = np.append(bucket_probs, 1 - bucket_probs.sum())
+    buckets = rng.multinomial(reads_per_position, bucket_probs)
+    for b in range(k):
+        jittered_rpp[b:b + len(reads_per_position)] += buckets[:, b]
 
     return jittered_rpp
 
 
-def plot_read_map(read_map: np.ndarray) -> plt.Figure:
+def plot_read_map(read_map: np.ndarray) -> Figure:
     """
     Plot a bar graph showing the number of reads aligned to each position in the genome.
 
@@ -148,7 +151,9 @@ def plot_read_map(read_map: np.ndarray) -> plt.Figure:
     x = [i for i in range(len(read_map))]
     y_max = int(read_map.max() * 1.25)
 
-    fig, ax = plt.subplots(figsize=(10, 4))
+    fig = Figure(figsize=(10, 4))
+
+    ax = fig.subplots()
     ax.bar(x, read_map, width=1, align='edge')
     ax.set_xlim(0, len(read_map) + 2)
     ax.set_ylim(0, y_max)
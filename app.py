@@ -1,9 +1,9 @@
 import matplotlib
 matplotlib.use('Agg')
-from flask import Flask, request, render_template, redirect, url_for, send_from_directory
+from flask import Flask, request, render_template, stream_template, redirect, url_for, send_from_directory, jsonify
 import numpy as np
-from initialization import create_reference_genome, index_reference_genome
 from hardy_weinberg import *
+from hardy_weinberg_batch import *
 from sanger import *
 from coverage import *
 from visualizations import *
@@ -11,6 +11,8 @@ from phasing import *
 from ChIP_seq import *
 import os
 import time
+import threading
+from collections import OrderedDict
 
 app = Flask(__name__)
 
@@ -21,6 +23,7 @@ def index():
 @app.route('/hardyweinberg', methods=["GET", "POST"])
 def hardy_weinberg():
     pop_size = 1000
+    num_loci = 100_000
     
     if request.method == "POST":
         p = float(request.form.get('p_value'))
@@ -28,12 +31,20 @@ def hardy_weinberg():
         theoretical = calculate_theoretical_genotypes(p)
         population_emoji, observed = calculate_observed_genotypes(p, pop_size)
         
+        # Null p-value distribution across many loci with the same p and population size
+        batch_results = simulate_hwe_tests(np.full(num_loci, p), pop_size)
+        hwe_plot_png = renderer_pool.render(plot_hwe_p_value_histogram, 'hwe_plot_png', batch_results)
+        
         return render_template(
             'hardy_weinberg.html',
             p_value=p,
             population_emoji=population_emoji,
             theoretical=theoretical,
-            observed=observed)
+            observed=observed,
+            num_loci=num_loci,
+            plot_png=hwe_plot_png,
+            chi_square_rejected=batch_results["chi_square_summary"]["rejected_fraction"],
+            exact_rejected=batch_results["exact_summary"]["rejected_fraction"])
     
     else:
         return render_template('hardy_weinberg.html')
@@ -55,12 +66,10 @@ def sanger():
         std_dev = np.std(termination_sites)
         
         # Plot
-        plot_object = plot_fragment_counts(fragment_counts, dd_ratio, seq_len)
-        sanger_plot_png = save_plot_to_png(plot_object, 'sanger_plot_png')
+        sanger_plot_png = renderer_pool.render(plot_fragment_counts, 'sanger_plot_png', fragment_counts, dd_ratio, seq_len)
         
         # Gell
-        plot_object = plot_gel_electrophoresis(fragment_counts, seq_len, dd_ratio)
-        gel_png = save_plot_to_png(plot_object, 'gel_png')
+        gel_png = renderer_pool.render(plot_gel_electrophoresis, 'gel_png', fragment_counts, seq_len, dd_ratio)
         
         return render_template(
             'sanger.html', 
@@ -78,51 +87,87 @@ def sanger():
             log_num_reactions=np.log10(1000)
         )
 
+# Recent /coverage simulations, keyed by (seed, read_length), so that raising num_reads
+# only simulates the added reads
+MAX_COVERAGE_SESSIONS = 32
+coverage_sessions = OrderedDict()
+coverage_sessions_lock = threading.Lock()
+
+def get_coverage_session(seed, read_length, num_reads, reference_length, kmer_length):
+    key = (seed, read_length)
+    evicted = []
+    with coverage_sessions_lock:
+        session = coverage_sessions.get(key)
+        if session is None or session.num_reads > num_reads:
+            if session is not None:
+                evicted.append(session)
+            session = CoverageSession(seed, read_length, reference_length, kmer_length)
+            coverage_sessions[key] = session
+        coverage_sessions.move_to_end(key)
+        while len(coverage_sessions) > MAX_COVERAGE_SESSIONS:
+            evicted.append(coverage_sessions.popitem(last=False)[1])
+
+    # Release evicted figures once no request is drawing them
+    for old_session in evicted:
+        with old_session.lock:
+            if old_session.figure is not None:
+                old_session.figure.clear()
+                old_session.figure = None
+    return session
+
 @app.route('/coverage', methods=["GET", "POST"])
 def coverage():
-    # initialize reference_genome and index
+    # reference_genome and index are fixed by the seed of each session
     reference_length = 1000
     kmer_length = 3
-    reference_genome = create_reference_genome(reference_length)
-    reference_index = index_reference_genome(reference_genome, kmer_length)
     
     # Default values
     read_length = 10
     num_reads = 100
         
-    if request.method == "POST":
-        read_length = int(request.form.get('read_length', 5))
-        num_reads = int(request.form.get('num_reads', 10))
-        
-        # Create Reads
-        reads = create_reads(reference_genome, read_length, num_reads)
-        print(reads.shape)
-        
-        # Align Reads
-        read_starts = align_reads(reference_genome, reference_index, kmer_length, reads)
-        print(min(read_starts), max(read_starts))
-        # create scaffold
-        scaffold = create_scaffold(reference_length, reads, read_starts)
-        
-        # Calculate Coverage, Unread Bases
-        coverage = calculate_coverage(read_length, num_reads, reference_length)
-        unread_bases = count_unread_bases(reference_genome, scaffold)
+    # Paging links come back as GET requests carrying the same seed and parameters
+    if request.method == "POST" or request.args.get('seed'):
+        read_length = int(request.values.get('read_length', 5))
+        num_reads = int(request.values.get('num_reads', 10))
+        seed = int(request.values.get('seed') or np.random.randint(2**31))
+        page = sequence_page(reference_length, int(request.args.get('start', 0)), SEQUENCE_DISPLAY_LIMIT, SEQUENCE_WINDOW)
         
-        # Plot
-        plot_object = plot_reads(read_length=read_length, read_starts=read_starts, scaffold=scaffold, reference_length=reference_length)
-        coverage_plot_png = save_plot_to_png(plot_object, 'coverage_plot_png')
-        
-        colored_reference_genome = color_sequence(reference_genome)
-        colored_scaffold = color_sequence(scaffold)
-        return render_template(
+        session = get_coverage_session(seed, read_length, num_reads, reference_length, kmer_length)
+        with session.lock:
+            # Another request may have grown the cached session past num_reads since it was
+            # looked up; answer this one from a private session instead
+            cached = session.num_reads <= num_reads
+            if not cached:
+                session = CoverageSession(seed, read_length, reference_length, kmer_length)
+
+            # Create and align only the reads added since the last step
+            session.extend(num_reads)
+            
+            # Calculate Coverage, Unread Bases
+            coverage = session.coverage()
+            unread_bases = session.unread_bases()
+            
+            # Plot
+            # A cached session keeps its figure to update on the next step, so it is not closed
+            plot_object = session.plot()
+            coverage_plot_png = renderer_pool.save(plot_object, 'coverage_plot_png', close=not cached)
+            
+            reference_genome = session.reference_genome
+            scaffold = session.scaffold.copy()
+
+        return stream_template(
             'coverage.html', 
             read_length=read_length, 
             num_reads=num_reads, 
+            seed=seed,
             plot_png=coverage_plot_png, 
             coverage=coverage, 
             unread_bases=unread_bases, 
-            colored_reference_genome=colored_reference_genome, 
-            colored_scaffold=colored_scaffold
+            reference_length=reference_length,
+            page=page,
+            sequence_windows=iter_sequence_windows(
+                reference_genome, scaffold, SEQUENCE_WINDOW, page['start'], page['stop'] - page['start']
+            )
         )
 
     else:
@@ -132,6 +177,10 @@ def coverage():
             num_reads=num_reads
         )
 
+@app.route('/render-stats')
+def render_stats():
+    return jsonify(renderer_pool.stats())
+
 @app.route('/static/plots/<filename>')
 def plot_png(filename):
     return send_from_directory('static/plots', filename)
@@ -159,8 +208,9 @@ def phasing():
         accumulated_misreads, first_misread_index = record_misreads(sequence, consensus_sequence)
 
         # Plot and Save Illumina Read
-        fig = plot_Illumina_read(sequence, read_values, consensus_sequence, accumulated_misreads, error_rate)
-        plot_png = save_plot_to_png(fig, "phasing_plot")
+        plot_png = renderer_pool.render(
+            plot_Illumina_read, "phasing_plot", sequence, read_values, consensus_sequence, accumulated_misreads, error_rate
+        )
 
         return render_template(
             "phasing.html",
@@ -201,8 +251,7 @@ def chipseq():
             antibody_specificity=specificity,
         )
 
-        plot_object = plot_read_map(read_map)
-        plot_png = save_plot_to_png(plot_object, "chipseq_plot")
+        plot_png = renderer_pool.render(plot_read_map, "chipseq_plot", read_map)
 
         return render_template(
             "chip-seq.html",
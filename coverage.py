@@ -1,5 +1,17 @@
+from typing import Callable, Iterable, Iterator
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from initialization import NUCLEOTIDES, N_CODE, encode_sequence, decode_sequence, kmer_values, reverse_complement, build_kmer_index, kmer_index_bytes, index_reference_genome
+
+# Bases per window, and the most bases rendered on one page, when showing sequences as HTML
+SEQUENCE_WINDOW = 1000
+SEQUENCE_DISPLAY_LIMIT = 100_000
+
+# ASCII byte for every encoded base, used when writing reads out
+_ASCII_BASES = np.frombuffer("".join(NUCLEOTIDES).encode("ascii"), dtype=np.uint8)
 
 def create_reads(reference_genome: np.ndarray, read_length: int, num_reads: int) -> np.ndarray:
     reference_length = len(reference_genome)
@@ -11,7 +23,62 @@ def create_reads(reference_genome: np.ndarray, read_length: int, num_reads: int)
 
     return np.array(reads)
 
+def generate_read_batches(reference_genome: np.ndarray, read_length: int, num_reads: int, batch_size: int = 100_000) -> Iterator[np.ndarray]:
+    """
+    Yields reads sampled the same way as create_reads, but batch_size at a time so the
+    full read matrix never has to be held in memory.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        read_length (int): length of each read
+        num_reads (int): total number of reads to generate
+        batch_size (int): maximum number of reads per batch
+
+    Yields:
+        np.ndarray: (reads in batch, read_length) array with the same dtype as the reference
+    """
+    reference_length = len(reference_genome)
+    offsets = np.arange(read_length)
+    for batch_start in range(0, num_reads, batch_size):
+        batch_reads = min(batch_size, num_reads - batch_start)
+        starts = np.random.randint(0, reference_length - read_length + 1, size=batch_reads)
+        yield reference_genome[starts[:, None] + offsets]
+
+def write_fastq(fastq_path: str, read_batches: Iterable[np.ndarray], read_name: str = "read", quality: str = "I") -> int:
+    """
+    Streams reads to a FASTQ file one batch at a time.
+
+    Args:
+        fastq_path (str): output path
+        read_batches (Iterable[np.ndarray]): read matrices, e.g. [create_reads(...)] or generate_read_batches(...)
+        read_name (str): prefix of each read name; reads are numbered from 1
+        quality (str): single Phred+33 character used for every base (default 'I' = Q40)
+
+    Returns:
+        int: number of reads written
+    """
+    num_written = 0
+    with open(fastq_path, "wb") as fastq:
+        for reads in read_batches:
+            reads = encode_sequence(np.atleast_2d(reads))
+            num_reads, read_length = reads.shape
+            sequences = _ASCII_BASES[np.minimum(reads, len(_ASCII_BASES) - 1)]
+            qualities = quality.encode("ascii") * read_length
+            records = [
+                b"@%s_%d\n%s\n+\n%s\n" % (read_name.encode("ascii"), num_written + r + 1, sequence.tobytes(), qualities)
+                for r, sequence in enumerate(sequences)
+            ]
+            fastq.write(b"".join(records))
+            num_written += num_reads
+
+    return num_written
+
 def align_reads(reference_genome: np.ndarray, reference_index: dict[str, list[int]], kmer_length: int, reads:np.ndarray) -> list[int]:
+    # The dict index is keyed by character kmers, so encoded inputs are decoded first
+    if reference_genome.dtype == np.uint8:
+        reference_genome = decode_sequence(reference_genome)
+    if reads.dtype == np.uint8:
+        reads = decode_sequence(reads)
     reference_length = len(reference_genome)
     num_reads, read_length = reads.shape
     read_starts = np.zeros(num_reads, dtype='int')
@@ -28,9 +95,492 @@ def align_reads(reference_genome: np.ndarray, reference_index: dict[str, list[in
     
     return read_starts
 
+def _apply_sequencing_errors(
+    templates: np.ndarray,
+    read_length: int,
+    substitution_rate: float,
+    insertion_rate: float,
+    deletion_rate: float,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Read each template from its first base with random substitutions, insertions and deletions,
+    keeping the first read_length bases produced. All reads are processed at once.
+
+    Args:
+        templates (np.ndarray): (num_reads, template_length) encoded templates, longer than read_length
+            so that deletions rarely run a read off the end of its template
+        read_length (int): length of each read
+        substitution_rate (float): per-base probability of reading the wrong base
+        insertion_rate (float): per-base probability of an extra random base before it
+        deletion_rate (float): per-base probability of skipping it
+
+    Returns:
+        np.ndarray: (num_reads, read_length) encoded reads
+    """
+    num_reads, template_length = templates.shape
+    events = rng.random((num_reads, template_length))
+    # Each template base is read 0 (deleted), 1 or 2 (preceded by an insertion) times
+    emitted = np.ones((num_reads, template_length), dtype=np.int64)
+    emitted[events < deletion_rate] = 0
+    emitted[(events >= deletion_rate) & (events < deletion_rate + insertion_rate)] = 2
+
+    flat_emitted = emitted.ravel()
+    source = np.repeat(np.arange(flat_emitted.size), flat_emitted)
+    row_ends = np.cumsum(emitted, axis=1)
+    read_index = source // template_length
+    position = np.arange(source.size) - np.repeat(np.concatenate(([0], row_ends[:, -1].cumsum()[:-1])), row_ends[:, -1])
+    keep = position < read_length
+
+    bases = templates.ravel()[source].copy()
+    # The first copy of a doubly read base is the inserted random base
+    inserted = np.zeros(source.size, dtype=bool)
+    inserted[1:] = source[1:] == source[:-1]
+    inserted = np.roll(inserted, -1)
+    bases[inserted] = rng.integers(0, 4, size=np.count_nonzero(inserted))
+    substituted = ~inserted & (bases != N_CODE) & (rng.random(source.size) < substitution_rate)
+    bases[substituted] = (bases[substituted] + rng.integers(1, 4, size=np.count_nonzero(substituted))) % 4
+
+    # Rare reads that ran out of template are padded with random bases
+    reads = rng.integers(0, 4, size=(num_reads, read_length)).astype(np.uint8)
+    reads[read_index[keep], position[keep]] = bases[keep]
+    return reads
+
+def _template_length(read_length: int, deletion_rate: float) -> int:
+    """Template bases needed so deletions almost never exhaust a read's template."""
+    return read_length + int(np.ceil(read_length * deletion_rate * 4)) + 8
+
+def create_reads_with_errors(
+    reference_genome: np.ndarray,
+    read_length: int,
+    num_reads: int,
+    substitution_rate: float = 0.01,
+    insertion_rate: float = 0.001,
+    deletion_rate: float = 0.001,
+    rng: np.random.Generator = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Like create_reads, but each read carries substitution and indel errors.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        read_length (int): length of each read
+        num_reads (int): number of reads
+        substitution_rate (float): per-base substitution probability
+        insertion_rate (float): per-base insertion probability
+        deletion_rate (float): per-base deletion probability
+        rng (np.random.Generator): random generator; a fresh one if None
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]:
+            - (num_reads, read_length) reads, in the same representation as the reference
+            - True start position of each read
+    """
+    rng = rng or np.random.default_rng()
+    codes = encode_sequence(reference_genome)
+    reference_length = len(codes)
+    template_length = _template_length(read_length, deletion_rate)
+
+    # Starts cover every position a read fits; templates running past the end repeat the last base
+    read_starts = rng.integers(0, reference_length - read_length + 1, size=num_reads)
+    templates = codes[np.minimum(read_starts[:, None] + np.arange(template_length), reference_length - 1)]
+    reads = _apply_sequencing_errors(templates, read_length, substitution_rate, insertion_rate, deletion_rate, rng)
+
+    return (reads if codes is reference_genome else decode_sequence(reads)), read_starts
+
+def create_read_pairs(
+    reference_genome: np.ndarray,
+    read_length: int,
+    num_pairs: int,
+    insert_mean: float = 300,
+    insert_std: float = 30,
+    substitution_rate: float = 0.01,
+    insertion_rate: float = 0.001,
+    deletion_rate: float = 0.001,
+    rng: np.random.Generator = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Simulate paired-end reads: mate 1 reads forward from the start of a fragment, mate 2 reads
+    the reverse strand back from its end. Fragment lengths are normally distributed.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        read_length (int): length of each mate
+        num_pairs (int): number of fragments
+        insert_mean (float): mean fragment length
+        insert_std (float): standard deviation of fragment length
+        substitution_rate (float): per-base substitution probability
+        insertion_rate (float): per-base insertion probability
+        deletion_rate (float): per-base deletion probability
+        rng (np.random.Generator): random generator; a fresh one if None
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            - Mate 1 reads
+            - Mate 2 reads (reverse complemented, as sequenced)
+            - Fragment start positions
+            - Fragment lengths
+    """
+    rng = rng or np.random.default_rng()
+    codes = encode_sequence(reference_genome)
+    reference_length = len(codes)
+    template_length = _template_length(read_length, deletion_rate)
+
+    fragment_lengths = np.rint(rng.normal(insert_mean, insert_std, size=num_pairs)).astype(np.int64)
+    fragment_lengths = np.clip(fragment_lengths, read_length, reference_length)
+    fragment_starts = rng.integers(0, reference_length - fragment_lengths + 1)
+
+    offsets = np.arange(template_length)
+    forward = codes[np.minimum(fragment_starts[:, None] + offsets, reference_length - 1)]
+    fragment_ends = fragment_starts + fragment_lengths
+    backward = reverse_complement(codes[np.maximum(fragment_ends[:, None] - template_length + offsets, 0)])
+
+    reads1 = _apply_sequencing_errors(forward, read_length, substitution_rate, insertion_rate, deletion_rate, rng)
+    reads2 = _apply_sequencing_errors(backward, read_length, substitution_rate, insertion_rate, deletion_rate, rng)
+    if codes is not reference_genome:
+        reads1, reads2 = decode_sequence(reads1), decode_sequence(reads2)
+
+    return reads1, reads2, fragment_starts, fragment_lengths
+
+def _verify_candidates(
+    codes: np.ndarray,
+    reads: np.ndarray,
+    candidate_reads: np.ndarray,
+    candidate_starts: np.ndarray,
+    band: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Banded edit distance of each read against the reference near its candidate start.
+
+    The read must align end to end; the reference may start and end anywhere within band of
+    the candidate. All candidates are filled in together, one read position per step, on
+    diagonals -band..band. Deletions within a row are resolved with a running minimum.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: edit distance, aligned start and aligned end of each candidate
+    """
+    read_length = reads.shape[1]
+    width = 2 * band + 1
+    diagonals = np.arange(-band, band + 1)
+    large = np.int32(read_length + 2 * width)
+
+    # Reference windows; positions outside the genome use a code no read base matches
+    window_positions = candidate_starts[:, None] - band + np.arange(read_length + 2 * band)
+    inside = (window_positions >= 0) & (window_positions < len(codes))
+    windows = np.where(inside, codes[np.clip(window_positions, 0, len(codes) - 1)], N_CODE + 1).astype(np.uint8)
+    windows[windows == N_CODE] = N_CODE + 1
+    candidate_bases = reads[candidate_reads]
+
+    # cost[c, d]: edits aligning read[:i] to the reference ending at candidate + i + d
+    cost = np.zeros((len(candidate_reads), width), dtype=np.int32)
+    origin = np.broadcast_to(diagonals, cost.shape).copy()
+    for i in range(1, read_length + 1):
+        matched = cost + (candidate_bases[:, i - 1, None] != windows[:, i - 1:i - 1 + width])
+        inserted = np.full_like(cost, large)
+        inserted[:, :-1] = cost[:, 1:] + 1
+        use_insert = inserted < matched
+        row = np.where(use_insert, inserted, matched)
+        row_origin = origin.copy()
+        row_origin[:, :-1] = np.where(use_insert[:, :-1], origin[:, 1:], origin[:, :-1])
+
+        # Deletions: row[d] = min over k <= d of row[k] + (d - k); the key keeps track of k
+        key = (row - np.arange(width) + width) * width + np.arange(width)
+        key = np.minimum.accumulate(key, axis=1)
+        source = key % width
+        cost = key // width - width + np.arange(width)
+        origin = np.take_along_axis(row_origin, source, axis=1)
+
+    best = np.argmin(cost, axis=1)
+    rows = np.arange(len(cost))
+    return (
+        cost[rows, best],
+        candidate_starts + origin[rows, best],
+        candidate_starts + read_length + diagonals[best],
+    )
+
+def align_reads_tolerant(
+    reference_genome: np.ndarray,
+    kmer_index: tuple[np.ndarray, np.ndarray],
+    kmer_length: int,
+    reads: np.ndarray,
+    max_edits: int = None,
+    band: int = None,
+    max_hits_per_seed: int = 64,
+    batch_size: int = 20_000
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Align reads that may contain sequencing errors.
+
+    Each read is cut into max_edits + 1 non-overlapping seeds (as many as fit), so a read with at
+    most max_edits errors has at least one exact seed. Seed hits in the kmer index give candidate
+    starts; candidates backed by a single seed are dropped when the read has a better-supported
+    one. The rest are checked for a near-exact match and otherwise verified with a banded edit
+    distance, batch_size candidates at a time.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        kmer_index (tuple[np.ndarray, np.ndarray]): index from initialization.build_kmer_index
+        kmer_length (int): kmer length of the index
+        reads (np.ndarray): (num_reads, read_length) reads
+        max_edits (int): most edits accepted for an alignment; defaults to 10% of the read length
+        band (int): largest net insertion/deletion offset searched; defaults to min(max_edits, 5)
+        max_hits_per_seed (int): seeds with more hits than this (repeats) only use the first hits
+        batch_size (int): candidates verified at once
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]:
+            - Aligned start of each read (-1 if unaligned)
+            - Aligned end (exclusive) of each read (-1 if unaligned)
+            - Edit distance of each read (-1 if unaligned)
+    """
+    codes = encode_sequence(reference_genome)
+    reads = encode_sequence(reads)
+    num_reads, read_length = reads.shape
+    if max_edits is None:
+        max_edits = max(1, read_length // 10)
+    if band is None:
+        band = min(max_edits, 5)
+    if kmer_length > read_length:
+        raise ValueError(f"kmer_length {kmer_length} is longer than the reads ({read_length}), so no seed fits")
+    index_values, index_positions = kmer_index
+
+    # Seed lookup for all reads at once
+    seed_offsets = np.arange(min(max_edits + 1, read_length // kmer_length)) * kmer_length
+    seed_values = kmer_values(reads[:, seed_offsets[:, None] + np.arange(kmer_length)], kmer_length)[..., 0]
+    # Query in the index's own dtype so searchsorted does not convert the whole index, and in
+    # sorted order so consecutive lookups walk the index in cache-friendly order
+    queries = np.where(seed_values >= 0, seed_values, 0).astype(index_values.dtype).ravel()
+    query_order = np.argsort(queries)
+    lows = np.empty(queries.size, dtype=np.int64)
+    highs = np.empty(queries.size, dtype=np.int64)
+    lows[query_order] = np.searchsorted(index_values, queries[query_order], side="left")
+    highs[query_order] = np.searchsorted(index_values, queries[query_order], side="right")
+    lows, highs = lows.reshape(seed_values.shape), highs.reshape(seed_values.shape)
+    hits = np.where(seed_values >= 0, np.minimum(highs - lows, max_hits_per_seed), 0).ravel()
+
+    hit_seeds = np.repeat(np.arange(hits.size), hits)
+    hit_rank = np.arange(hit_seeds.size) - np.repeat(np.cumsum(hits) - hits, hits)
+    candidate_reads = hit_seeds // len(seed_offsets)
+    candidate_starts = index_positions[lows.ravel()[hit_seeds] + hit_rank].astype(np.int64) - seed_offsets[hit_seeds % len(seed_offsets)]
+    # Seeds of the same read usually agree on the start; verify each (read, start) once
+    span = len(codes) + 2 * read_length
+    hit_keys = np.sort(candidate_reads * span + candidate_starts + read_length)
+    candidate_keys = np.unique(hit_keys)
+    candidate_reads, candidate_starts = candidate_keys // span, candidate_keys % span - read_length
+
+    # Drop lone random seed hits when another candidate of the read is backed by several seeds
+    # (within band of each other, to allow for indels)
+    support = np.searchsorted(hit_keys, candidate_keys + band, side="right") - np.searchsorted(hit_keys, candidate_keys - band, side="left")
+    best_support = np.zeros(num_reads, dtype=np.int64)
+    np.maximum.at(best_support, candidate_reads, support)
+    supported = support >= np.minimum(best_support[candidate_reads], 2)
+    candidate_reads, candidate_starts = candidate_reads[supported], candidate_starts[supported]
+
+    # Candidates with at most one mismatch and no indel are already optimal for their read;
+    # only reads without one go through the banded edit distance
+    edits = np.empty(len(candidate_reads), dtype=np.int64)
+    starts = candidate_starts.copy()
+    ends = candidate_starts + read_length
+    for batch_start in range(0, len(candidate_reads), batch_size):
+        batch = slice(batch_start, batch_start + batch_size)
+        positions = candidate_starts[batch, None] + np.arange(read_length)
+        inside = (positions >= 0) & (positions < len(codes))
+        reference_bases = np.where(inside, codes[np.clip(positions, 0, len(codes) - 1)], N_CODE)
+        edits[batch] = np.count_nonzero((reference_bases != reads[candidate_reads[batch]]) | (reference_bases == N_CODE), axis=1)
+    resolved_reads = np.zeros(num_reads, dtype=bool)
+    resolved_reads[candidate_reads[edits <= 1]] = True
+    unresolved = np.flatnonzero(~resolved_reads[candidate_reads])
+
+    for batch_start in range(0, len(unresolved), batch_size):
+        batch = unresolved[batch_start:batch_start + batch_size]
+        edits[batch], starts[batch], ends[batch] = _verify_candidates(
+            codes, reads, candidate_reads[batch], candidate_starts[batch], band
+        )
+
+    # Keep the lowest-edit candidate of each read
+    read_starts = np.full(num_reads, -1, dtype=np.int64)
+    read_ends = np.full(num_reads, -1, dtype=np.int64)
+    edit_distances = np.full(num_reads, -1, dtype=np.int64)
+    order = np.lexsort((edits, candidate_reads))
+    best_reads, first = np.unique(candidate_reads[order], return_index=True)
+    best = order[first]
+    aligned = edits[best] <= max_edits
+    read_starts[best_reads[aligned]] = np.clip(starts[best[aligned]], 0, len(codes))
+    read_ends[best_reads[aligned]] = np.clip(ends[best[aligned]], 0, len(codes))
+    edit_distances[best_reads[aligned]] = edits[best[aligned]]
+
+    return read_starts, read_ends, edit_distances
+
+def align_read_pairs(
+    reference_genome: np.ndarray,
+    kmer_index: tuple[np.ndarray, np.ndarray],
+    kmer_length: int,
+    reads1: np.ndarray,
+    reads2: np.ndarray,
+    insert_mean: float = 300,
+    insert_std: float = 30,
+    max_edits: int = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Align paired-end reads from create_read_pairs and check that each pair is concordant.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        kmer_index (tuple[np.ndarray, np.ndarray]): index from initialization.build_kmer_index
+        kmer_length (int): kmer length of the index
+        reads1 (np.ndarray): mate 1 reads
+        reads2 (np.ndarray): mate 2 reads, as sequenced from the reverse strand
+        insert_mean (float): expected mean fragment length
+        insert_std (float): expected fragment length standard deviation
+        max_edits (int): most edits accepted per mate
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]:
+            - Aligned fragment start (mate 1 start, -1 if unaligned)
+            - Aligned fragment end (mate 2 end, -1 if unaligned)
+            - Whether both mates aligned in the expected orientation within 4 standard deviations of insert_mean
+    """
+    starts1, ends1, _ = align_reads_tolerant(reference_genome, kmer_index, kmer_length, reads1, max_edits)
+    starts2, ends2, _ = align_reads_tolerant(
+        reference_genome, kmer_index, kmer_length, reverse_complement(encode_sequence(reads2)), max_edits
+    )
+    fragment_lengths = ends2 - starts1
+    concordant = (
+        (starts1 >= 0) & (starts2 >= 0) & (starts2 >= starts1)
+        & (np.abs(fragment_lengths - insert_mean) <= 4 * insert_std)
+    )
+    return starts1, ends2, concordant
+
+def simulate_coverage_chunked(
+    reference_genome: np.ndarray,
+    read_length: int,
+    num_reads: int,
+    kmer_index: tuple[np.ndarray, np.ndarray] = None,
+    kmer_length: int = 16,
+    substitution_rate: float = 0.0,
+    insertion_rate: float = 0.0,
+    deletion_rate: float = 0.0,
+    align: bool = True,
+    memory_limit_mb: float = 4096,
+    progress: Callable[[int, int], None] = None,
+    rng: np.random.Generator = None
+) -> tuple[np.ndarray, dict]:
+    """
+    Simulate sequencing coverage in bounded memory by streaming read batches through
+    generate -> align -> accumulate depth. Only the depth track and summary counters are kept;
+    reads, alignments and scaffold are discarded after each batch.
+
+    The batch size is chosen so that the depth track, the kmer index and one batch of working
+    arrays stay under memory_limit_mb. The index's size (and the peak while building it) is
+    estimated up front, so a limit that is too small fails before any large array is allocated.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        read_length (int): length of each read
+        num_reads (int): total number of reads
+        kmer_index (tuple[np.ndarray, np.ndarray]): index from initialization.build_kmer_index; built here if None and align is True
+        kmer_length (int): kmer length of the index; long enough that random seed hits stay rare on large references.
+            When the index is built here for reads shorter than this, shorter seeds are used instead
+        substitution_rate (float): per-base substitution probability
+        insertion_rate (float): per-base insertion probability
+        deletion_rate (float): per-base deletion probability
+        align (bool): align every read; if False reads are placed at their sampled start and never generated
+        memory_limit_mb (float): memory ceiling for the pipeline's own arrays, in megabytes (excluding the reference)
+        progress (Callable[[int, int], None]): called with (reads done, num_reads) after every batch
+        rng (np.random.Generator): random generator; a fresh one if None
+
+    Returns:
+        tuple[np.ndarray, dict]:
+            - Read depth at every reference position
+            - Summary counters: num_reads, aligned_reads, unaligned_reads, mean_edit_distance, coverage,
+              mean_depth, unread_bases, gaps, batch_size, num_batches
+    """
+    rng = rng or np.random.default_rng()
+    codes = encode_sequence(reference_genome)
+    reference_length = len(codes)
+    template_length = min(_template_length(read_length, deletion_rate), reference_length)
+
+    build_index = align and kmer_index is None
+    if build_index and kmer_length > read_length:
+        # Short reads: shrink the seeds so the aligner's default max_edits + 1 of them fit
+        kmer_length = max(1, read_length // (max(1, read_length // 10) + 1))
+    elif align and kmer_length > read_length:
+        raise ValueError(f"kmer_length {kmer_length} of the given index is longer than the reads ({read_length})")
+
+    # Check the budget before building anything, including the index and its sort
+    limit_bytes = memory_limit_mb * 2**20
+    fixed_bytes = 4 * (reference_length + 1)
+    if build_index:
+        build_peak, index_bytes = kmer_index_bytes(reference_length, kmer_length)
+        if build_peak > limit_bytes:
+            raise ValueError(
+                f"memory_limit_mb={memory_limit_mb} is too small: building the kmer index needs about "
+                f"{build_peak / 2**20:.0f} MB"
+            )
+        fixed_bytes += index_bytes
+    elif align:
+        fixed_bytes += sum(array.nbytes for array in kmer_index)
+    # Rough peak bytes per read of the working arrays in one batch
+    read_bytes = 64 * template_length + 96 * read_length if align else 64
+    budget = limit_bytes - fixed_bytes
+    if budget < read_bytes:
+        raise ValueError(
+            f"memory_limit_mb={memory_limit_mb} is too small: the depth track and index alone need "
+            f"{fixed_bytes / 2**20:.0f} MB"
+        )
+    if build_index:
+        kmer_index = build_kmer_index(codes, kmer_length)
+    batch_size = int(min(num_reads, budget // read_bytes)) or 1
+
+    # Depth changes at read starts and ends; summed into the depth track at the end
+    depth = np.zeros(reference_length + 1, dtype=np.int32)
+    aligned_reads = 0
+    total_edits = 0
+    num_batches = 0
+    for batch_start in range(0, num_reads, batch_size):
+        batch_reads = min(batch_size, num_reads - batch_start)
+        if align:
+            reads, _ = create_reads_with_errors(
+                codes, read_length, batch_reads, substitution_rate, insertion_rate, deletion_rate, rng
+            )
+            starts, ends, edits = align_reads_tolerant(codes, kmer_index, kmer_length, reads, batch_size=batch_reads)
+            del reads
+            placed = starts >= 0
+            starts, ends = starts[placed], ends[placed]
+            total_edits += int(edits[placed].sum())
+        else:
+            starts = rng.integers(0, reference_length - read_length + 1, size=batch_reads)
+            ends = starts + read_length
+        np.add.at(depth, starts, 1)
+        np.add.at(depth, ends, -1)
+        aligned_reads += len(starts)
+        num_batches += 1
+        if progress is not None:
+            progress(batch_start + batch_reads, num_reads)
+
+    depth = np.cumsum(depth[:reference_length], out=depth[:reference_length])
+    callable_bases = codes != N_CODE
+    summary = {
+        "num_reads": num_reads,
+        "aligned_reads": aligned_reads,
+        "unaligned_reads": num_reads - aligned_reads,
+        "mean_edit_distance": total_edits / aligned_reads if aligned_reads else 0.0,
+        "coverage": calculate_coverage(read_length, num_reads, reference_length),
+        "mean_depth": float(depth.mean()) if reference_length else 0.0,
+        "unread_bases": int(np.count_nonzero((depth == 0) & callable_bases)),
+        "gaps": count_gaps(depth, callable_bases),
+        "batch_size": batch_size,
+        "num_batches": num_batches,
+    }
+
+    return depth, summary
+
 def create_scaffold(reference_length: np.ndarray, reads: np.ndarray, read_starts: list[int]) -> np.ndarray:
     num_reads, read_length = reads.shape
-    scaffold = np.array(["N" for _ in range(reference_length)])
+    if reads.dtype == np.uint8:
+        scaffold = np.full(reference_length, N_CODE, dtype=np.uint8)
+    else:
+        scaffold = np.array(["N" for _ in range(reference_length)])
     for i in range(num_reads):
         scaffold[read_starts[i]: read_starts[i] + read_length] = reads[i]
     
@@ -41,42 +591,140 @@ def calculate_coverage(read_length: int, num_reads: int, reference_length: int):
 
 def count_unread_bases(reference_genome: np.ndarray, scaffold: np.ndarray) -> int:
     reference_length = len(reference_genome)
+    if reference_genome.dtype != scaffold.dtype:
+        reference_genome, scaffold = encode_sequence(reference_genome), encode_sequence(scaffold)
     return reference_length - sum(scaffold == reference_genome)
 
+def _sequence_text(sequence: np.ndarray) -> str:
+    """Join a character or uint8 encoded sequence into a plain string."""
+    if sequence.dtype == np.uint8:
+        return _ASCII_BASES[np.minimum(sequence, len(_ASCII_BASES) - 1)].tobytes().decode("ascii")
+    return "".join(sequence.tolist())
+
+def iter_colored_sequence(sequence: np.ndarray) -> Iterator[str]:
+    """
+    Yield the sequence as HTML with one span per run of read or unread ('N') bases.
+    Spans carry the CSS classes base-read / base-unread instead of inline styles.
+
+    Args:
+        sequence (np.ndarray): character or uint8 encoded sequence
+
+    Yields:
+        str: one <span> per run
+    """
+    sequence = np.asarray(list(sequence) if isinstance(sequence, str) else sequence)
+    if len(sequence) == 0:
+        return
+    is_unread = sequence == (N_CODE if sequence.dtype == np.uint8 else "N")
+    run_starts = np.concatenate(([0], np.flatnonzero(is_unread[1:] != is_unread[:-1]) + 1))
+    run_ends = np.append(run_starts[1:], len(sequence))
+    for start, end in zip(run_starts, run_ends):
+        css_class = "base-unread" if is_unread[start] else "base-read"
+        yield f'<span class="{css_class}">{_sequence_text(sequence[start:end])}</span>'
+
+def calculate_depth(read_starts: np.ndarray, read_length: int, reference_length: int) -> np.ndarray:
+    """
+    Count how many reads cover each reference position.
+
+    Args:
+        read_starts (np.ndarray): start position of each read
+        read_length (int): length of each read
+        reference_length (int): length of the reference genome
+
+    Returns:
+        np.ndarray: read depth at every reference position
+    """
+    read_starts = np.asarray(read_starts)
+    depth = np.bincount(read_starts, minlength=reference_length + 1)
+    depth[:reference_length + 1] -= np.bincount(np.minimum(read_starts + read_length, reference_length), minlength=reference_length + 1)
+    return np.cumsum(depth[:reference_length])
+
+def count_gaps(depth: np.ndarray, callable_bases: np.ndarray = None) -> int:
+    """
+    Count the gaps (maximal runs of unread bases) in a depth track.
+
+    Args:
+        depth (np.ndarray): read depth at every reference position
+        callable_bases (np.ndarray): optional mask of positions that can be read at all (e.g. not 'N' in the reference)
+
+    Returns:
+        int: number of gaps
+    """
+    unread = depth == 0
+    if callable_bases is not None:
+        unread &= callable_bases
+    if len(unread) == 0:
+        return 0
+    return int(unread[0]) + int(np.count_nonzero(unread[1:] & ~unread[:-1]))
+
 def color_sequence(sequence: str) -> str:
     """Format sequence so that all characters are blue except 'N', which remains black."""
-    return "".join(
-        f'<span style="color: black;">{char}</span>' if char == "N" 
-        else f'<span style="color: blue;">{char}</span>' 
-        for char in sequence
-    )
+    return "".join(iter_colored_sequence(sequence))
 
-def plot_reads(read_length: int, read_starts: np.ndarray, scaffold: np.ndarray, reference_length: int):
-    """_summary_
+def iter_sequence_windows(
+    reference_genome: np.ndarray,
+    scaffold: np.ndarray,
+    window: int = SEQUENCE_WINDOW,
+    start: int = 0,
+    max_bases: int = SEQUENCE_DISPLAY_LIMIT
+) -> Iterator[tuple[int, str, str]]:
+    """
+    Yield the reference and scaffold as aligned, colored windows so long sequences can be
+    streamed to the page (and paged through with start) instead of rendered in one string.
 
     Args:
-        read_length (int): _description_
-        read_starts (np.ndarray): _description_
-        reference_length (int): _description_
+        reference_genome (np.ndarray): reference genome
+        scaffold (np.ndarray): scaffold aligned to the reference
+        window (int): bases per window
+        start (int): first base to show
+        max_bases (int): maximum number of bases shown from start
 
-    Returns:
-        _type_: _description_
+    Yields:
+        tuple[int, str, str]: window start position, colored reference, colored scaffold
     """
-    num_reads = len(read_starts)
-    
-    fig, ax = plt.subplots(figsize=(10, 4))
+    stop = min(len(reference_genome), start + max_bases)
+    for window_start in range(start, stop, window):
+        window_end = min(window_start + window, stop)
+        yield (
+            window_start,
+            "".join(iter_colored_sequence(reference_genome[window_start:window_end])),
+            "".join(iter_colored_sequence(scaffold[window_start:window_end])),
+        )
 
-    # Plot each read
-    for i, start in enumerate(read_starts):
-        ax.plot([start, start + read_length], [num_reads - i, num_reads - i], color='blue', linewidth=0.5)
+def sequence_page(reference_length: int, start: int = 0, max_bases: int = SEQUENCE_DISPLAY_LIMIT, window: int = SEQUENCE_WINDOW) -> dict:
+    """
+    Work out which part of a long sequence one page shows, for paging with iter_sequence_windows.
 
-    # Plot scaffold
-    scaffold_colors = np.where(scaffold == "N", "gray", "blue")
-    for i in range(reference_length - 1):
-        ax.plot([i, i + 1], [-0.5, -0.5], color=scaffold_colors[i], linewidth=4)
+    Args:
+        reference_length (int): length of the full sequence
+        start (int): requested first base; clamped to the sequence and snapped to a window boundary
+        max_bases (int): maximum number of bases shown on one page
+        window (int): bases per window
 
-    # Formatting the plot
-    ax.set_xlim(0, reference_length)
+    Returns:
+        dict: start and stop of the page, and previous_start / next_start (None at either end)
+    """
+    max_bases = max(window, max_bases - max_bases % window)
+    last_start = max(0, reference_length - 1) // window * window
+    start = min(max(0, start), last_start) // window * window
+    stop = min(reference_length, start + max_bases)
+    return {
+        "start": start,
+        "stop": stop,
+        "previous_start": max(0, start - max_bases) if start > 0 else None,
+        "next_start": stop if stop < reference_length else None,
+    }
+
+def _read_segments(read_length: int, read_starts: np.ndarray, first_row: int = 0) -> np.ndarray:
+    """Line segments for reads drawn one per row, starting at row first_row + 1."""
+    rows = np.arange(first_row + 1, first_row + len(read_starts) + 1)
+    return np.stack([
+        np.column_stack([read_starts, rows]),
+        np.column_stack([np.asarray(read_starts) + read_length, rows]),
+    ], axis=1)
+
+def _format_read_axis(ax: Axes, num_reads: int) -> None:
+    """Fit the y axis to num_reads rows of reads above the scaffold."""
     ax.set_ylim(-1, num_reads + 1)
     if num_reads >= 10:
         yticks = list(np.linspace(1, num_reads, min(11, num_reads), dtype=int))
@@ -84,6 +732,40 @@ def plot_reads(read_length: int, read_starts: np.ndarray, scaffold: np.ndarray,
         yticks = list(range(1, num_reads + 1))
     ax.set_yticks(yticks)
 
+def plot_reads(read_length: int, read_starts: np.ndarray, scaffold: np.ndarray, reference_length: int):
+    """
+    Plot every aligned read as a line above the scaffold, with unread scaffold bases in gray.
+
+    Args:
+        read_length (int): length of each read
+        read_starts (np.ndarray): aligned start of each read
+        scaffold (np.ndarray): scaffold built from the reads ('N' where unread)
+        reference_length (int): length of the reference genome
+
+    Returns:
+        matplotlib.figure.Figure: the reads plot; extend it with update_reads_plot
+    """
+    num_reads = len(read_starts)
+    
+    fig = Figure(figsize=(10, 4))
+    
+    ax = fig.subplots()
+
+    # Plot scaffold, one segment per base so that its colors can be updated
+    positions = np.arange(reference_length)
+    scaffold_segments = np.stack([np.column_stack([positions, np.full(reference_length, -0.5)]),
+                                  np.column_stack([positions + 1, np.full(reference_length, -0.5)])], axis=1)
+    ax.add_collection(LineCollection(
+        scaffold_segments, colors=np.where(scaffold == "N", "gray", "blue"), linewidths=4, gid="scaffold"
+    ))
+
+    # Plot each read
+    ax.add_collection(LineCollection(_read_segments(read_length, read_starts), colors="blue", linewidths=0.5))
+
+    # Formatting the plot
+    ax.set_xlim(0, reference_length)
+    _format_read_axis(ax, num_reads)
+
     ax.set_xlabel("Reference Genome Position (Gray are unread bases)")
     ax.set_ylabel("Read")
     ax.set_title("Aligned Reads to Reference Genome")
@@ -91,5 +773,98 @@ def plot_reads(read_length: int, read_starts: np.ndarray, scaffold: np.ndarray,
     
     return fig
 
+def update_reads_plot(fig: Figure, read_length: int, new_read_starts: np.ndarray, num_reads: int, scaffold: np.ndarray) -> Figure:
+    """
+    Add newly aligned reads to a figure from plot_reads instead of redrawing it.
+
+    Args:
+        fig (matplotlib.figure.Figure): figure returned by plot_reads
+        read_length (int): length of each read
+        new_read_starts (np.ndarray): aligned starts of the reads added since the figure was last drawn
+        num_reads (int): total number of reads after the update
+        scaffold (np.ndarray): updated scaffold
+
+    Returns:
+        matplotlib.figure.Figure: the same figure
+    """
+    ax = fig.axes[0]
+    first_row = num_reads - len(new_read_starts)
+    ax.add_collection(LineCollection(_read_segments(read_length, new_read_starts, first_row), colors="blue", linewidths=0.5))
+    for collection in ax.collections:
+        if collection.get_gid() == "scaffold":
+            collection.set_colors(np.where(scaffold == "N", "gray", "blue"))
+    _format_read_axis(ax, num_reads)
+
+    return fig
+
+class CoverageSession:
+    """
+    One /coverage simulation that can be extended with more reads.
+
+    The genome is determined by the seed. Raising num_reads only generates, aligns and plots the
+    added reads; the depth track, scaffold and figure from earlier steps are kept.
+    """
+
+    def __init__(self, seed: int, read_length: int, reference_length: int = 1000, kmer_length: int = 3):
+        genome_seed, reads_seed = np.random.SeedSequence(seed).spawn(2)
+        self.seed = seed
+        self.read_length = read_length
+        self.reference_length = reference_length
+        self.kmer_length = kmer_length
+        self.reference_genome = np.random.default_rng(genome_seed).choice(["A", "T", "G", "C"], reference_length)
+        self.reference_index = index_reference_genome(self.reference_genome, kmer_length)
+        self.rng = np.random.default_rng(reads_seed)
+
+        self.read_starts = np.zeros(0, dtype=int)
+        self.depth = np.zeros(reference_length, dtype=int)
+        self.scaffold = np.full(reference_length, "N")
+        self.figure = None
+        self._plotted_reads = 0
+        self.lock = threading.Lock()
+
+    @property
+    def num_reads(self) -> int:
+        return len(self.read_starts)
+
+    def extend(self, num_reads: int) -> np.ndarray:
+        """
+        Generate and align reads until the session holds num_reads reads.
+
+        Args:
+            num_reads (int): total number of reads wanted; must not be below the current count
+
+        Returns:
+            np.ndarray: aligned starts of the added reads
+        """
+        if num_reads < self.num_reads:
+            raise ValueError(f"Session already holds {self.num_reads} reads; cannot shrink to {num_reads}")
+
+        starts = self.rng.integers(0, self.reference_length - self.read_length + 1, size=num_reads - self.num_reads)
+        reads = self.reference_genome[starts[:, None] + np.arange(self.read_length)]
+        new_read_starts = align_reads(self.reference_genome, self.reference_index, self.kmer_length, reads) if len(reads) else starts
+
+        for start, read in zip(new_read_starts, reads):
+            self.scaffold[start:start + self.read_length] = read
+        self.depth += calculate_depth(new_read_starts, self.read_length, self.reference_length)
+        self.read_starts = np.concatenate([self.read_starts, new_read_starts])
+
+        return new_read_starts
+
+    def coverage(self) -> float:
+        return calculate_coverage(self.read_length, self.num_reads, self.reference_length)
+
+    def unread_bases(self) -> int:
+        return count_unread_bases(self.reference_genome, self.scaffold)
+
+    def plot(self) -> Figure:
+        """Draw the reads plot, or add the reads aligned since the last call to it."""
+        if self.figure is None:
+            self.figure = plot_reads(self.read_length, self.read_starts, self.scaffold, self.reference_length)
+        elif self._plotted_reads < self.num_reads:
+            update_reads_plot(self.figure, self.read_length, self.read_starts[self._plotted_reads:], self.num_reads, self.scaffold)
+        self._plotted_reads = self.num_reads
+
+        return self.figure
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,205 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from matplotlib.figure import Figure
+from initialization import N_CODE, encode_sequence
+from coverage import calculate_coverage, calculate_depth, count_gaps
+
+# Set in each worker process by _attach_reference
+_shared_block = None
+_reference_genome = None
+
+
+def _attach_reference(shm_name: str, reference_length: int) -> None:
+    """Pool initializer: map the shared reference genome into this worker without copying it."""
+    global _shared_block, _reference_genome
+    _shared_block = shared_memory.SharedMemory(name=shm_name)
+    _reference_genome = np.ndarray((reference_length,), dtype=np.uint8, buffer=_shared_block.buf)
+
+def _replicate_task(read_length: int, num_reads: int, seed: np.random.SeedSequence, num_replicates: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate num_replicates runs of one (read_length, num_reads) setting against the shared reference.
+
+    Reads are perfect, so each read is placed at its sampled start rather than realigned.
+    Starts are drawn along the whole reference, 'N' blocks included; bases that are 'N' can
+    never be read and are excluded from the counts.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: unread bases and gaps of every replicate
+    """
+    rng = np.random.default_rng(seed)
+    reference_length = len(_reference_genome)
+    callable_bases = _reference_genome != N_CODE
+
+    unread_bases = np.zeros(num_replicates, dtype=np.int64)
+    gaps = np.zeros(num_replicates, dtype=np.int64)
+    for r in range(num_replicates):
+        read_starts = rng.integers(0, reference_length - read_length + 1, size=num_reads)
+        depth = calculate_depth(read_starts, read_length, reference_length)
+        unread_bases[r] = np.count_nonzero((depth == 0) & callable_bases)
+        gaps[r] = count_gaps(depth, callable_bases)
+
+    return unread_bases, gaps
+
+def lander_waterman_prediction(
+    read_length: int,
+    num_reads: int,
+    reference_length: int,
+    callable_length: int = None,
+    num_callable_blocks: int = 0
+) -> tuple[float, float, float]:
+    """
+    Lander–Waterman expectations for reads placed uniformly along the whole reference.
+
+    Reads still land in 'N' blocks, so coverage c is taken over the full reference length; only
+    the callable bases are counted as unread, and each callable block that follows an 'N' block
+    opens one extra gap with probability e^-c.
+
+    Args:
+        read_length (int): length of each read
+        num_reads (int): number of reads
+        reference_length (int): length of the whole reference genome
+        callable_length (int): number of non-'N' bases; defaults to reference_length
+        num_callable_blocks (int): number of callable blocks that start right after an 'N'
+
+    Returns:
+        tuple[float, float, float]: coverage c, expected unread bases G_callable·e^-c,
+            expected gaps (N·G_callable/G + blocks)·e^-c
+    """
+    if callable_length is None:
+        callable_length = reference_length
+    coverage = calculate_coverage(read_length, num_reads, reference_length)
+    expected_unread = callable_length * np.exp(-coverage)
+    expected_gaps = (num_reads * callable_length / reference_length + num_callable_blocks) * np.exp(-coverage)
+    return coverage, expected_unread, expected_gaps
+
+def run_coverage_replicates(
+    reference_genome: np.ndarray,
+    settings: list[tuple[int, int]],
+    num_replicates: int = 100,
+    seed: int = None,
+    processes: int = None,
+    replicates_per_task: int = 25,
+    percentile_range: float = 0.95
+) -> dict[str, np.ndarray]:
+    """
+    Measure unread bases and gaps versus coverage across many replicates and settings.
+
+    The reference is placed in shared memory once and mapped by every worker of a process pool.
+    Each task gets its own child SeedSequence, so results are reproducible for a given seed
+    regardless of how tasks are scheduled across workers.
+
+    Args:
+        reference_genome (np.ndarray): reference genome (character or uint8 encoded array)
+        settings (list[tuple[int, int]]): (read_length, num_reads) pairs to simulate
+        num_replicates (int): replicates per setting
+        seed (int): seed for the whole run; None draws fresh entropy
+        processes (int): worker processes; None uses every CPU, 1 runs in this process
+        replicates_per_task (int): replicates simulated per pool task
+        percentile_range (float): fraction of replicate values inside the reported percentile range
+
+    Returns:
+        dict[str, np.ndarray]: one entry per setting for each of read_length, num_reads, coverage,
+            unread_mean, unread_std, unread_lower, unread_upper, gaps_mean, gaps_std, gaps_lower,
+            gaps_upper, expected_unread and expected_gaps (Lander–Waterman)
+    """
+    reference_genome = encode_sequence(reference_genome)
+    reference_length = len(reference_genome)
+    callable_bases = reference_genome != N_CODE
+    callable_length = int(np.count_nonzero(callable_bases))
+    num_callable_blocks = int(np.count_nonzero(callable_bases[1:] & ~callable_bases[:-1]))
+    for read_length, num_reads in settings:
+        if not 0 < read_length <= reference_length:
+            raise ValueError(f"read_length {read_length} must be between 1 and the reference length {reference_length}")
+
+    # One task per block of replicates, each with an independent seed
+    tasks = []
+    for s, (read_length, num_reads) in enumerate(settings):
+        block_sizes = [min(replicates_per_task, num_replicates - b) for b in range(0, num_replicates, replicates_per_task)]
+        for block_seed, block_size in zip(np.random.SeedSequence(seed).spawn(len(settings))[s].spawn(len(block_sizes)), block_sizes):
+            tasks.append((s, read_length, num_reads, block_seed, block_size))
+
+    results = [([], []) for _ in settings]
+    global _reference_genome
+    if processes == 1:
+        _reference_genome = reference_genome
+        for s, *task in tasks:
+            unread_bases, gaps = _replicate_task(*task)
+            results[s][0].append(unread_bases)
+            results[s][1].append(gaps)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(reference_length, 1))
+        try:
+            np.ndarray((reference_length,), dtype=np.uint8, buffer=shm.buf)[:] = reference_genome
+            with ProcessPoolExecutor(max_workers=processes, initializer=_attach_reference, initargs=(shm.name, reference_length)) as pool:
+                futures = [(s, pool.submit(_replicate_task, *task)) for s, *task in tasks]
+                for s, future in futures:
+                    unread_bases, gaps = future.result()
+                    results[s][0].append(unread_bases)
+                    results[s][1].append(gaps)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    tail = 100 * (1 - percentile_range) / 2
+    stats = {key: [] for key in (
+        "read_length", "num_reads", "coverage",
+        "unread_mean", "unread_std", "unread_lower", "unread_upper",
+        "gaps_mean", "gaps_std", "gaps_lower", "gaps_upper",
+        "expected_unread", "expected_gaps",
+    )}
+    for (read_length, num_reads), (unread_blocks, gap_blocks) in zip(settings, results):
+        coverage, expected_unread, expected_gaps = lander_waterman_prediction(
+            read_length, num_reads, reference_length, callable_length, num_callable_blocks
+        )
+        for name, values in (("unread", np.concatenate(unread_blocks)), ("gaps", np.concatenate(gap_blocks))):
+            stats[f"{name}_mean"].append(values.mean())
+            stats[f"{name}_std"].append(values.std())
+            stats[f"{name}_lower"].append(np.percentile(values, tail))
+            stats[f"{name}_upper"].append(np.percentile(values, 100 - tail))
+        stats["read_length"].append(read_length)
+        stats["num_reads"].append(num_reads)
+        stats["coverage"].append(coverage)
+        stats["expected_unread"].append(expected_unread)
+        stats["expected_gaps"].append(expected_gaps)
+
+    return {key: np.array(values) for key, values in stats.items()}
+
+def plot_unread_curve(stats: dict[str, np.ndarray], callable_length: int) -> Figure:
+    """
+    Plot empirical unread bases and gaps versus coverage over the Lander–Waterman prediction.
+
+    Args:
+        stats (dict[str, np.ndarray]): output of run_coverage_replicates
+        callable_length (int): number of non-'N' reference bases, used to scale the prediction
+
+    Returns:
+        matplotlib.figure.Figure: unread bases (left) and gaps (right) versus coverage
+    """
+    order = np.argsort(stats["coverage"])
+    coverage = stats["coverage"][order]
+    curve = np.linspace(0, coverage.max() * 1.05, 200)
+
+    fig = Figure(figsize=(12, 4))
+    ax_unread, ax_gaps = fig.subplots(1, 2)
+    for ax, name, label in ((ax_unread, "unread", "Unread bases"), (ax_gaps, "gaps", "Gaps")):
+        mean = stats[f"{name}_mean"][order]
+        ax.errorbar(
+            coverage, mean,
+            yerr=[mean - stats[f"{name}_lower"][order], stats[f"{name}_upper"][order] - mean],
+            fmt="o", color="blue", markersize=3, capsize=2, label="Simulated (mean, replicate percentile range)"
+        )
+        ax.set_xlabel("Coverage (L × N / G)")
+        ax.set_ylabel(label)
+        ax.set_yscale("log")
+        ax.grid(True, linestyle="--", alpha=0.5)
+
+    ax_unread.plot(curve, callable_length * np.exp(-curve), color="black", linestyle=":", label="Lander–Waterman G·e^-c")
+    ax_gaps.plot(coverage, stats["expected_gaps"][order], color="black", linestyle=":", label="Lander–Waterman N·e^-c")
+    ax_unread.set_title("Unread Bases vs. Coverage")
+    ax_gaps.set_title("Gaps vs. Coverage")
+    ax_unread.legend()
+    ax_gaps.legend()
+    fig.tight_layout()
+
+    return fig
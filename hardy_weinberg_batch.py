@@ -0,0 +1,195 @@
+import numpy as np
+from matplotlib.figure import Figure
+from scipy.stats import chi2
+
+
+def simulate_genotype_counts(p: np.ndarray, sample_sizes: np.ndarray, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Simulate genotype counts under Hardy-Weinberg equilibrium for many loci in one call.
+
+    Args:
+        p (np.ndarray): allele frequency of p at each locus
+        sample_sizes (np.ndarray): number of individuals sampled at each locus (or one size for all)
+        rng (np.random.Generator): random generator; a fresh one if None
+
+    Returns:
+        np.ndarray: (num_loci, 3) counts of homozygous p, heterozygous and homozygous q
+    """
+    rng = rng or np.random.default_rng()
+    p = np.asarray(p, dtype=float)
+    q = 1 - p
+    genotype_probs = np.stack([p**2, 2 * p * q, q**2], axis=-1)
+    return rng.multinomial(np.broadcast_to(sample_sizes, p.shape), genotype_probs)
+
+def hwe_chi_square(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pearson chi-square test of Hardy-Weinberg equilibrium (1 degree of freedom) at every locus.
+
+    Args:
+        counts (np.ndarray): (num_loci, 3) genotype counts
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: chi-square statistic and p-value of each locus
+                                       (monomorphic loci get 0 and 1)
+    """
+    counts = np.asarray(counts, dtype=float)
+    sample_sizes = counts.sum(axis=1)
+    p = (2 * counts[:, 0] + counts[:, 1]) / np.maximum(2 * sample_sizes, 1)
+    q = 1 - p
+    expected = sample_sizes[:, None] * np.stack([p**2, 2 * p * q, q**2], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(expected > 0, (counts - expected) ** 2 / expected, 0)
+    statistic = terms.sum(axis=1)
+    return statistic, chi2.sf(statistic, df=1)
+
+def _het_window_width(sample_size: int) -> int:
+    """
+    Heterozygote counts (in steps of 2) examined around the expected count. The heterozygote
+    standard deviation is at most sqrt(n) / 2, so this spans +/- 12 standard deviations; the
+    probability outside is below 1e-30.
+    """
+    return 2 * int(np.ceil(3 * np.sqrt(sample_size))) + 2
+
+def _exact_p_values(sample_sizes: np.ndarray, minor_counts: np.ndarray, het_counts: np.ndarray) -> np.ndarray:
+    """
+    Exact HWE p-values for one block of (sample size, minor allele count, heterozygote count) triples.
+
+    The heterozygote count given the allele counts follows the distribution of Wigginton et al. (2005).
+    Its probabilities over a window around the expected count are built from the ratio
+    P(h + 2) / P(h) = 4 * hom_major(h) * hom_minor(h) / ((h + 1)(h + 2)); the p-value is the total
+    probability of counts no more likely than the observed one.
+    """
+    n = sample_sizes[:, None].astype(float)
+    minor = minor_counts[:, None]
+    width = _het_window_width(sample_sizes.max())
+
+    expected = minor * (2 * n - minor) / np.maximum(2 * n - 1, 1)
+    first = np.maximum(np.rint(expected).astype(np.int64) - width, 0)
+    first += (first - minor) % 2  # same parity as the minor allele count
+    hets = first + 2 * np.arange(width)
+    possible = hets <= minor
+
+    # Column k holds log P(hets[k]) / P(hets[k - 1]), using 4 * hom_major * hom_minor = (2n - minor - h)(minor - h)
+    log_probs = np.zeros((len(n), width))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_probs[:, 1:] = np.log(
+            (2 * n - minor - hets[:, :-1]) * (minor - hets[:, :-1]) / ((hets[:, :-1] + 1.0) * (hets[:, :-1] + 2.0))
+        )
+    np.cumsum(log_probs, axis=1, out=log_probs)
+    log_probs[~possible] = -np.inf
+    log_probs -= log_probs.max(axis=1, keepdims=True)
+    probs = np.exp(log_probs, out=log_probs)
+
+    observed = (het_counts - first[:, 0]) // 2
+    in_window = (observed >= 0) & (observed < width)
+    observed_probs = np.where(in_window, probs[np.arange(len(n)), np.clip(observed, 0, width - 1)], 0.0)
+    total = probs.sum(axis=1)
+    probs[probs > observed_probs[:, None] * (1 + 1e-7)] = 0
+    return np.minimum(probs.sum(axis=1) / total, 1.0)
+
+def hwe_exact(counts: np.ndarray, block_cells: int = 1 << 23) -> np.ndarray:
+    """
+    Exact test of Hardy-Weinberg equilibrium at every locus.
+
+    Loci with the same sample size, minor allele count and heterozygote count share a p-value, so
+    each distinct triple is computed once, block_cells probability cells at a time.
+
+    Args:
+        counts (np.ndarray): (num_loci, 3) genotype counts
+        block_cells (int): most probability cells computed at once
+
+    Returns:
+        np.ndarray: exact p-value of each locus
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    sample_sizes = counts.sum(axis=1)
+    minor_counts = np.minimum(2 * counts[:, 0] + counts[:, 1], 2 * counts[:, 2] + counts[:, 1])
+    # One integer key per triple; np.unique on it is much faster than on rows
+    max_count = int(2 * sample_sizes.max()) + 1
+    keys = (sample_sizes * max_count + minor_counts) * max_count + counts[:, 1]
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    triple_sizes, rest = np.divmod(unique_keys, max_count * max_count)
+    triple_minor, triple_hets = np.divmod(rest, max_count)
+
+    # Triples are sorted by sample size, so each block has a similar window width
+    triple_p_values = np.empty(len(unique_keys))
+    block_start = 0
+    while block_start < len(unique_keys):
+        rows = max(1, block_cells // _het_window_width(triple_sizes[block_start]))
+        block = slice(block_start, block_start + rows)
+        triple_p_values[block] = _exact_p_values(triple_sizes[block], triple_minor[block], triple_hets[block])
+        block_start += rows
+
+    return triple_p_values[key_index]
+
+def summarize_p_values(p_values: np.ndarray, alpha: float = 0.05, bins: int = 20) -> dict:
+    """
+    Summarize the distribution of p-values across loci.
+
+    Args:
+        p_values (np.ndarray): p-value of each locus
+        alpha (float): significance level
+        bins (int): number of histogram bins on [0, 1]
+
+    Returns:
+        dict: histogram counts and bin edges, fraction rejected at alpha, and the 5/25/50/75/95% quantiles
+    """
+    histogram, bin_edges = np.histogram(p_values, bins=bins, range=(0, 1))
+    return {
+        "histogram": histogram,
+        "bin_edges": bin_edges,
+        "rejected_fraction": float(np.mean(p_values < alpha)),
+        "quantiles": np.quantile(p_values, [0.05, 0.25, 0.5, 0.75, 0.95]),
+    }
+
+def simulate_hwe_tests(p: np.ndarray, sample_sizes: np.ndarray, alpha: float = 0.05, rng: np.random.Generator = None) -> dict:
+    """
+    Simulate genotype counts for many loci and test each for Hardy-Weinberg equilibrium.
+
+    Args:
+        p (np.ndarray): allele frequency of p at each locus
+        sample_sizes (np.ndarray): number of individuals sampled at each locus (or one size for all)
+        alpha (float): significance level for the summaries
+        rng (np.random.Generator): random generator; a fresh one if None
+
+    Returns:
+        dict: counts, chi_square, chi_square_p, exact_p, and summaries of both p-value sets
+    """
+    counts = simulate_genotype_counts(p, sample_sizes, rng)
+    chi_square, chi_square_p = hwe_chi_square(counts)
+    exact_p = hwe_exact(counts)
+    return {
+        "counts": counts,
+        "chi_square": chi_square,
+        "chi_square_p": chi_square_p,
+        "exact_p": exact_p,
+        "chi_square_summary": summarize_p_values(chi_square_p, alpha),
+        "exact_summary": summarize_p_values(exact_p, alpha),
+    }
+
+def plot_hwe_p_value_histogram(results: dict) -> Figure:
+    """
+    Plot the null distribution of chi-square and exact HWE p-values from simulate_hwe_tests.
+
+    Args:
+        results (dict): output of simulate_hwe_tests
+
+    Returns:
+        matplotlib.figure.Figure: p-value histograms with the uniform expectation
+    """
+    num_loci = len(results["exact_p"])
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    for name, label, color in (("chi_square", "Chi-square", "blue"), ("exact", "Exact", "orange")):
+        summary = results[f"{name}_summary"]
+        ax.stairs(summary["histogram"], summary["bin_edges"], color=color,
+                  label=f"{label} test ({summary['rejected_fraction']:.1%} with p < 0.05)")
+    bins = len(results["exact_summary"]["histogram"])
+    ax.axhline(num_loci / bins, color="black", linestyle=":", label="Uniform (ideal null)")
+    ax.set_xlim(0, 1)
+    ax.set_xlabel("p-value")
+    ax.set_ylabel("Loci")
+    ax.set_title(f"HWE Test p-values Across {num_loci:,} Simulated Loci in Equilibrium")
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.5)
+    return fig
@@ -1,8 +1,21 @@
 from typing import List, Tuple
 import numpy as np
 import os
+import sys
 import csv
 
+# Compact nucleotide encoding shared by the large-scale simulators: one uint8 per base
+NUCLEOTIDES = np.array(["A", "C", "G", "T", "N"])
+N_CODE = 4
+_ENCODE_LOOKUP = np.full(256, N_CODE, dtype=np.uint8)
+for _code, _base in enumerate("ACGT"):
+    _ENCODE_LOOKUP[ord(_base)] = _code
+    _ENCODE_LOOKUP[ord(_base.lower())] = _code
+# Bytes that are not part of a sequence line (line endings and other whitespace)
+_SKIP_CODE = 255
+for _char in b"\n\r\t\v\f ":
+    _ENCODE_LOOKUP[_char] = _SKIP_CODE
+
 def create_reference_genome(reference_length: int) -> np.ndarray:
     """
     Creates an nd.array of nucleotide base n long as a reference genome
@@ -26,6 +39,8 @@ def index_reference_genome(reference_genome: np.ndarray, kmer_length: int = 3) -
     Returns:
         dict: index of genome by kmer
     """
+    if reference_genome.dtype == np.uint8:
+        reference_genome = decode_sequence(reference_genome)
     reference_index = {}
     reference_length = len(reference_genome)
     
@@ -38,3 +53,230 @@ def index_reference_genome(reference_genome: np.ndarray, kmer_length: int = 3) -
     
     return reference_index
 
+
+def encode_sequence(sequence: np.ndarray) -> np.ndarray:
+    """
+    Encodes a nucleotide character array into the compact uint8 representation
+
+    Args:
+        sequence (nd.array): array of single nucleotide characters (or an already encoded array)
+
+    Returns:
+        nd.array: uint8 array where A=0, C=1, G=2, T=3 and anything else is N=4
+    """
+    sequence = np.asarray(sequence)
+    if sequence.dtype == np.uint8:
+        return sequence
+    ascii_bytes = sequence.astype("S1").view(np.uint8)
+    codes = _ENCODE_LOOKUP[ascii_bytes]
+    codes[codes == _SKIP_CODE] = N_CODE
+    return codes
+
+def decode_sequence(codes: np.ndarray) -> np.ndarray:
+    """
+    Decodes a compact uint8 sequence back into nucleotide characters
+
+    Args:
+        codes (nd.array): uint8 encoded sequence
+
+    Returns:
+        nd.array: array of single nucleotide characters
+    """
+    return NUCLEOTIDES[np.minimum(codes, N_CODE)]
+
+_COMPLEMENT_CODES = np.array([3, 2, 1, 0, N_CODE], dtype=np.uint8)
+
+def kmer_values(codes: np.ndarray, kmer_length: int) -> np.ndarray:
+    """
+    Computes the base-4 integer value of every kmer along the last axis of an encoded sequence
+
+    Args:
+        codes (nd.array): uint8 encoded sequence(s), 1D or 2D
+        kmer_length (int): kmer length (at most 31)
+
+    Returns:
+        nd.array: int64 kmer values, -1 where the kmer contains an N
+    """
+    num_kmers = codes.shape[-1] - kmer_length + 1
+    values = np.zeros(codes.shape[:-1] + (max(num_kmers, 0),), dtype=np.int64)
+    has_n = np.zeros(values.shape, dtype=bool)
+    for j in range(kmer_length):
+        window = codes[..., j:j + num_kmers]
+        values = values * 4 + (window & 3)
+        has_n |= window == N_CODE
+    values[has_n] = -1
+    return values
+
+def kmer_index_bytes(reference_length: int, kmer_length: int = 12, block_size: int = 1 << 20) -> Tuple[int, int]:
+    """
+    Estimates the memory build_kmer_index needs, so callers can check a budget before building
+
+    Args:
+        reference_length (int): length of the reference genome
+        kmer_length (int): kmer length to index
+        block_size (int): reference bases processed at once by build_kmer_index
+
+    Returns:
+        tuple: (peak bytes while building, bytes of the finished index)
+    """
+    num_kmers = max(reference_length - kmer_length + 1, 0)
+    if kmer_length <= 16 and reference_length < 2**32:
+        # Packed uint64 sort keys, then uint32 values and positions split out of them,
+        # plus the int64 kmer values and masks of one block
+        return 16 * num_kmers + 32 * min(block_size, num_kmers), 8 * num_kmers
+    # int64 values, their argsort and the uint32/int64 positions
+    position_bytes = 4 if reference_length < 2**32 else 8
+    return (34 + 2 * position_bytes) * num_kmers, (8 + position_bytes) * num_kmers
+
+def build_kmer_index(reference_genome: np.ndarray, kmer_length: int = 12, block_size: int = 1 << 20) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indexes an encoded reference genome by kmer as sorted arrays rather than a dict,
+    so that many kmers can be looked up at once with np.searchsorted
+
+    For kmers of up to 16 bases the reference is processed block_size bases at a time, and
+    each kmer value and position are packed into one uint64 key so a single in-place sort
+    orders them; peak memory is then about 16 bytes per base (see kmer_index_bytes).
+
+    Args:
+        reference_genome (nd.array): reference genome (character or uint8 encoded array)
+        kmer_length (int): kmer length to index
+        block_size (int): reference bases processed at once
+
+    Returns:
+        tuple: (sorted kmer values, reference position of each kmer); kmers containing N are left out
+    """
+    codes = encode_sequence(reference_genome)
+    num_kmers = max(len(codes) - kmer_length + 1, 0)
+    if kmer_length > 16 or len(codes) >= 2**32:
+        values = kmer_values(codes, kmer_length)
+        positions = np.flatnonzero(values >= 0)
+        positions = positions.astype(np.uint32 if len(values) < 2**32 else np.int64)
+        values = values[positions]
+        order = np.argsort(values, kind="stable")
+        return values[order], positions[order]
+
+    keys = np.empty(num_kmers, dtype=np.uint64)
+    num_keys = 0
+    for block_start in range(0, num_kmers, block_size):
+        block_end = min(block_start + block_size, num_kmers)
+        block_values = kmer_values(codes[block_start:block_end + kmer_length - 1], kmer_length)
+        valid = np.flatnonzero(block_values >= 0)
+        block_keys = block_values[valid].astype(np.uint64) << np.uint64(32)
+        block_keys |= (valid + block_start).astype(np.uint64)
+        keys[num_keys:num_keys + len(block_keys)] = block_keys
+        num_keys += len(block_keys)
+    keys = keys[:num_keys]
+    # Positions are the low bits, so equal kmers stay in reference order as with a stable sort
+    keys.sort()
+    # Split the high (value) and low (position) halves out of the keys without temporaries
+    halves = keys.view(np.uint32).reshape(-1, 2)
+    high = 1 if sys.byteorder == "little" else 0
+    return halves[:, high].copy(), halves[:, 1 - high].copy()
+
+def reverse_complement(codes: np.ndarray) -> np.ndarray:
+    """
+    Reverse complements encoded sequence(s) along the last axis
+
+    Args:
+        codes (nd.array): uint8 encoded sequence(s)
+
+    Returns:
+        nd.array: reverse complement
+    """
+    return _COMPLEMENT_CODES[codes[..., ::-1]]
+
+def _find_line_end(fasta: np.ndarray, start: int, end: int, window: int = 1 << 12) -> int:
+    """
+    Finds the first newline in fasta[start:end], scanning a small window at a time so a
+    header line is found without touching the rest of a (possibly huge) record
+
+    Returns:
+        int: position of the newline, or end if there is none
+    """
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        newlines = np.flatnonzero(fasta[window_start:window_end] == ord("\n"))
+        if len(newlines):
+            return window_start + int(newlines[0])
+        window_start = window_end
+        window = min(window * 2, 1 << 20)
+    return end
+
+def _fasta_record_spans(fasta: np.ndarray, block_size: int) -> List[Tuple[str, int, int]]:
+    """
+    Finds the name and byte span of the sequence lines of every record in a FASTA file
+
+    Args:
+        fasta (nd.array): memory-mapped bytes of the FASTA file
+        block_size (int): number of bytes scanned at once
+
+    Returns:
+        list: (record name, first sequence byte, end byte) for each record
+    """
+    file_length = len(fasta)
+    header_starts = []
+    for block_start in range(0, file_length, block_size):
+        block = fasta[block_start:block_start + block_size]
+        header_starts.extend((np.flatnonzero(block == ord(">")) + block_start).tolist())
+    # '>' only starts a header at the beginning of a line
+    header_starts = [h for h in header_starts if h == 0 or fasta[h - 1] in (ord("\n"), ord("\r"))]
+
+    spans = []
+    for r, header_start in enumerate(header_starts):
+        record_end = header_starts[r + 1] if r + 1 < len(header_starts) else file_length
+        header_end = _find_line_end(fasta, header_start, record_end)
+        header = bytes(fasta[header_start + 1:header_end]).decode("ascii", errors="replace").strip()
+        name = header.split()[0] if header else f"record_{r}"
+        spans.append((name, min(header_end + 1, record_end), record_end))
+
+    return spans
+
+def load_reference_genome_fasta(fasta_path: str, record_name: str = None, block_size: int = 1 << 24, decode: bool = False) -> np.ndarray:
+    """
+    Memory-maps a FASTA file and encodes one record into the compact uint8 reference genome.
+    The file text is never read into memory as a whole; it is encoded block by block.
+
+    The encoded genome feeds generate_read_batches, write_fastq, align_reads_tolerant and
+    simulate_coverage_chunked directly. The original dict-based functions (index_reference_genome,
+    align_reads, create_scaffold, count_unread_bases) also accept it, but decode it to characters
+    internally; pass decode=True to get the character array they were written for.
+
+    Args:
+        fasta_path (str): path to an uncompressed FASTA file
+        record_name (str): name of the record to load (first word of the header); defaults to the first record
+        block_size (int): number of bytes encoded at once
+        decode (bool): return single nucleotide characters instead of uint8 codes (4 bytes per base)
+
+    Returns:
+        nd.array: uint8 encoded reference genome (see encode_sequence), or characters if decode is set
+    """
+    if os.path.getsize(fasta_path) == 0:
+        raise ValueError(f"{fasta_path} is empty")
+
+    fasta = np.memmap(fasta_path, dtype=np.uint8, mode="r")
+    spans = _fasta_record_spans(fasta, block_size)
+    if not spans:
+        raise ValueError(f"{fasta_path} contains no FASTA records")
+
+    if record_name is None:
+        name, start, end = spans[0]
+    else:
+        matches = [span for span in spans if span[0] == record_name]
+        if not matches:
+            raise KeyError(f"Record '{record_name}' not found in {fasta_path}")
+        name, start, end = matches[0]
+
+    # Line endings only shrink the sequence, so the byte span is an upper bound on its length
+    reference_genome = np.empty(end - start, dtype=np.uint8)
+    reference_length = 0
+    for block_start in range(start, end, block_size):
+        codes = _ENCODE_LOOKUP[fasta[block_start:min(block_start + block_size, end)]]
+        codes = codes[codes != _SKIP_CODE]
+        reference_genome[reference_length:reference_length + len(codes)] = codes
+        reference_length += len(codes)
+    del fasta
+
+    reference_genome = reference_genome[:reference_length]
+    return decode_sequence(reference_genome) if decode else reference_genome
+
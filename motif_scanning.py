@@ -0,0 +1,177 @@
+import numpy as np
+from scipy.signal import fftconvolve
+from initialization import N_CODE, encode_sequence
+
+
+def one_hot_encode(reference_genome: np.ndarray) -> np.ndarray:
+    """
+    One-hot encode a genome as four rows in A, C, G, T order. N positions are all zero.
+
+    Args:
+        reference_genome (np.ndarray): genome (character or uint8 encoded array)
+
+    Returns:
+        np.ndarray: (4, genome_length) float32 one-hot matrix
+    """
+    codes = encode_sequence(reference_genome)
+    one_hot = np.zeros((4, len(codes)), dtype=np.float32)
+    called = codes != N_CODE
+    one_hot[codes[called], np.flatnonzero(called)] = 1
+    return one_hot
+
+def pwm_from_sites(sites: np.ndarray, pseudocount: float = 0.5, background: np.ndarray = None) -> np.ndarray:
+    """
+    Build a log-odds position weight matrix from aligned binding sites.
+
+    Args:
+        sites (np.ndarray): (num_sites, motif_length) aligned sites (character or uint8 encoded)
+        pseudocount (float): added to every base count before normalizing
+        background (np.ndarray): background frequencies of A, C, G, T; uniform if None
+
+    Returns:
+        np.ndarray: (4, motif_length) log2-odds scores
+    """
+    codes = encode_sequence(np.atleast_2d(sites))
+    counts = np.stack([(codes == base).sum(axis=0) for base in range(4)]).astype(float) + pseudocount
+    return pwm_from_probabilities(counts / counts.sum(axis=0), background)
+
+def pwm_from_probabilities(probabilities: np.ndarray, background: np.ndarray = None) -> np.ndarray:
+    """
+    Convert a position probability matrix into log2-odds scores against a background.
+
+    Args:
+        probabilities (np.ndarray): (4, motif_length) base probabilities per position, A, C, G, T order
+        background (np.ndarray): background frequencies of A, C, G, T; uniform if None
+
+    Returns:
+        np.ndarray: (4, motif_length) log2-odds scores
+    """
+    background = np.full(4, 0.25) if background is None else np.asarray(background, dtype=float)
+    return np.log2(probabilities / background[:, None]).astype(np.float32)
+
+def reverse_complement_pwm(pwm: np.ndarray) -> np.ndarray:
+    """Scores of the motif on the reverse strand: complement rows (A<->T, C<->G) and reverse columns."""
+    return pwm[::-1, ::-1]
+
+def _scan_chunk_lookup(codes: np.ndarray, stacked_pwms: np.ndarray, num_positions: int) -> np.ndarray:
+    """
+    Score every motif at each start by looking up column scores by base. Columns are taken three
+    at a time from a table indexed by the base triplet, so each motif needs length / 3 passes.
+    """
+    num_motifs, num_codes, motif_length = stacked_pwms.shape
+    triplets = (codes[:-2] * num_codes + codes[1:-1]) * num_codes + codes[2:]
+    triplet_codes = np.arange(num_codes**3)
+    first, second, third = triplet_codes // num_codes**2, triplet_codes // num_codes % num_codes, triplet_codes % num_codes
+
+    scores = np.zeros((num_motifs, num_positions), dtype=np.float32)
+    for j in range(0, motif_length, 3):
+        table = stacked_pwms[:, first, j] + stacked_pwms[:, second, j + 1] + stacked_pwms[:, third, j + 2]
+        for m in range(num_motifs):
+            scores[m] += table[m].take(triplets[j:j + num_positions])
+    return scores
+
+def _scan_chunk_fft(codes: np.ndarray, stacked_pwms: np.ndarray, num_positions: int) -> np.ndarray:
+    """Score every motif at each start by FFT cross-correlation of the one-hot genome with the PWM."""
+    one_hot = one_hot_encode(codes)
+    # Correlation is convolution with the motif reversed along its length
+    kernels = stacked_pwms[:, :4, ::-1]
+    scores = fftconvolve(one_hot[None], kernels, mode="valid", axes=2).sum(axis=1)
+    return scores[:, :num_positions].astype(np.float32)
+
+def scan_pwms(
+    reference_genome: np.ndarray,
+    pwms: list[np.ndarray],
+    both_strands: bool = True,
+    method: str = "lookup",
+    chunk_size: int = 1 << 18
+) -> np.ndarray:
+    """
+    Score several PWMs at every position of a genome.
+
+    The genome is processed chunk_size bases at a time; each chunk carries the next
+    (longest motif - 1) bases so motifs spanning a chunk boundary are scored once.
+    N bases contribute 0 to a score.
+
+    Args:
+        reference_genome (np.ndarray): genome (character or uint8 encoded array)
+        pwms (list[np.ndarray]): (4, motif_length) log-odds matrices, e.g. from pwm_from_sites
+        both_strands (bool): report the better of the forward and reverse strand scores
+        method (str): "lookup" sums column scores indexed by base; "fft" cross-correlates the
+                      one-hot genome with each PWM (faster for long motifs)
+        chunk_size (int): bases scored per chunk
+
+    Returns:
+        np.ndarray: (num_motifs, genome_length) float32 log-odds score of each motif starting at
+                    each position; -inf where the motif runs off the end of the genome
+    """
+    if method not in ("lookup", "fft"):
+        raise ValueError(f"Unknown scan method '{method}'; use 'lookup' or 'fft'")
+    scan_chunk = _scan_chunk_lookup if method == "lookup" else _scan_chunk_fft
+
+    codes = encode_sequence(reference_genome)
+    genome_length = len(codes)
+    motif_lengths = [pwm.shape[1] for pwm in pwms]
+    # Rounded up to whole base triplets for the lookup method
+    max_length = -(-max(motif_lengths) // 3) * 3
+
+    # Pad every motif to the same length with zero-score columns, and add a zero row for N
+    strand_pwms = [pwm for pwm in pwms] + ([reverse_complement_pwm(pwm) for pwm in pwms] if both_strands else [])
+    stacked_pwms = np.zeros((len(strand_pwms), N_CODE + 1, max_length), dtype=np.float32)
+    for m, pwm in enumerate(strand_pwms):
+        stacked_pwms[m, :4, :pwm.shape[1]] = pwm
+
+    # Forward and reverse strand scores are combined per chunk, so only the result is genome sized
+    num_motifs = len(pwms)
+    scores = np.empty((num_motifs, genome_length), dtype=np.float32)
+    for chunk_start in range(0, genome_length, chunk_size):
+        num_positions = min(chunk_size, genome_length - chunk_start)
+        chunk = codes[chunk_start:chunk_start + num_positions + max_length - 1]
+        if len(chunk) < num_positions + max_length - 1:
+            # Only the last chunk runs off the end of the genome; pad it with N
+            chunk = np.concatenate([chunk, np.full(num_positions + max_length - 1 - len(chunk), N_CODE, dtype=np.uint8)])
+        chunk_scores = scan_chunk(chunk, stacked_pwms, num_positions)
+        if both_strands:
+            np.maximum(chunk_scores[:num_motifs], chunk_scores[num_motifs:], out=scores[:, chunk_start:chunk_start + num_positions])
+        else:
+            scores[:, chunk_start:chunk_start + num_positions] = chunk_scores
+
+    for m, motif_length in enumerate(motif_lengths):
+        scores[m, genome_length - motif_length + 1:] = -np.inf
+
+    return scores
+
+def affinity_track(scores: np.ndarray, threshold: float = None) -> np.ndarray:
+    """
+    Turn log-odds scores into binding probabilities for the ChIP-seq read simulator.
+
+    Occupancy follows a logistic curve in the score, reaching 0.5 at threshold.
+
+    Args:
+        scores (np.ndarray): (num_motifs, genome_length) or (genome_length,) scores from scan_pwms
+        threshold (float): log2-odds score of half occupancy; defaults to 3/4 of the best score seen
+
+    Returns:
+        np.ndarray: (genome_length,) probability that any of the motifs is bound at each position
+    """
+    scores = np.atleast_2d(scores)
+    if threshold is None:
+        threshold = 0.75 * np.max(scores[np.isfinite(scores)])
+    with np.errstate(over="ignore"):
+        bound = 1 / (1 + np.exp2(threshold - scores))
+    # Independent motifs: the position is unbound only if no motif binds
+    return 1 - np.prod(1 - bound, axis=0)
+
+def sample_motif_sites(probabilities: np.ndarray, count: int) -> np.ndarray:
+    """
+    Draw binding site variants from a position probability matrix.
+
+    Args:
+        probabilities (np.ndarray): (4, motif_length) base probabilities per position, A, C, G, T order
+        count (int): number of sites
+
+    Returns:
+        np.ndarray: (count, motif_length) uint8 encoded sites
+    """
+    cumulative = np.cumsum(probabilities, axis=0)
+    draws = np.random.random((count, probabilities.shape[1]))
+    return (draws[:, None, :] > cumulative[None] * (1 - 1e-9)).sum(axis=1).astype(np.uint8)
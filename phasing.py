@@ -1,5 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 
 def generate_sequence(length: int = 50) -> np.ndarray:
@@ -119,7 +119,7 @@ def plot_Illumina_read(
     consensus_sequence: np.ndarray,
     accumulated_misreads: np.ndarray,
     error_rate: float
-) -> plt.Figure:
+) -> Figure:
     """
     Plot base signal intensities and cumulative misreads over sequencing cycles.
 
@@ -140,7 +140,9 @@ def plot_Illumina_read(
     T = read_values[:, 2]
     C = read_values[:, 3]
 
-    fig, ax = plt.subplots(figsize=(15, 4))
+    fig = Figure(figsize=(15, 4))
+
+    ax = fig.subplots()
     x = range(len(sequence))
 
     ax.plot(x, G, color='orange', label='G')
@@ -191,7 +193,7 @@ def simulate_phasing_errors(actual: np.ndarray, error_rate: float) -> np.ndarray
     return read
 
 
-def plot_phasing_degradation(actual: np.ndarray, read: np.ndarray, error_rate: float) -> plt.Figure:
+def plot_phasing_degradation(actual: np.ndarray, read: np.ndarray, error_rate: float) -> Figure:
     """
     Create a plot showing cumulative mismatch accumulation due to phasing errors.
 
@@ -201,12 +203,14 @@ def plot_phasing_degradation(actual: np.ndarray, read: np.ndarray, error_rate: f
         error_rate (float): The phasing error rate used.
 
     Returns:
-        plt.Figure: A matplotlib figure object.
+        matplotlib.figure.Figure: A matplotlib figure object.
     """
     mismatches = np.array([actual[i] != read[i] for i in range(len(actual))], dtype=int)
     cumulative = np.cumsum(mismatches)
 
-    fig, ax = plt.subplots(figsize=(10, 4))
+    fig = Figure(figsize=(10, 4))
+
+    ax = fig.subplots()
     ax.plot(range(1, len(actual) + 1), cumulative, color='crimson', marker='o')
     ax.set_title(f"Phasing Error Accumulation (error rate = {error_rate})")
     ax.set_xlabel("Read Cycle")
@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.colors as mcolors
 from scipy.ndimage import gaussian_filter
+from scipy import sparse
+from initialization import encode_sequence
 
 
 def simulate_sanger(seq_len: int, dd_ratio: float, num_reactions: int) -> np.ndarray:
@@ -19,8 +21,130 @@ def simulate_sanger(seq_len: int, dd_ratio: float, num_reactions: int) -> np.nda
 
     return fragment_counts, termination_sites
 
+def simulate_sanger_batch(seq_len: int, dd_ratio: float, num_reactions: int, num_templates: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Run simulate_sanger for many templates at once.
+
+    Parameters:
+        seq_len (int): Length of each template.
+        dd_ratio (float): ddNTP/dNTP ratio.
+        num_reactions (int): Extension reactions per template.
+        num_templates (int): Number of templates.
+        rng (np.random.Generator): Random generator; a fresh one if None.
+
+    Returns:
+        np.ndarray: (num_templates, seq_len) fragment counts per termination position.
+    """
+    rng = rng or np.random.default_rng()
+    termination_sites = rng.geometric(p=dd_ratio, size=(num_templates, num_reactions))
+    template_index = np.broadcast_to(np.arange(num_templates)[:, None], termination_sites.shape)
+    kept = termination_sites <= seq_len
+    flat_sites = template_index[kept] * seq_len + termination_sites[kept] - 1
+    return np.bincount(flat_sites, minlength=num_templates * seq_len).reshape(num_templates, seq_len)
+
+def _peak_operator(
+    seq_len: int,
+    samples_per_base: int,
+    peak_width: float,
+    width_growth: float,
+    mobility_compression: float
+) -> sparse.csr_matrix:
+    """
+    Sparse (seq_len, num_samples) matrix whose row i is the Gaussian peak of a fragment
+    terminating at base i + 1. Longer fragments migrate relatively closer together and diffuse
+    into wider peaks, so peak spacing shrinks and width grows with position. Every peak has the
+    same area (one unit of fluorescence spreads out as it widens); the first peak has height 1.
+    """
+    positions = np.arange(seq_len)
+    relative = positions / seq_len
+    centers = samples_per_base * (positions + 0.5 - mobility_compression * positions * relative / 2)
+    widths = samples_per_base * peak_width * (1 + width_growth * relative)
+    num_samples = int(np.ceil(centers[-1] + 4 * widths[-1])) + 1
+
+    # Each peak is evaluated only within 4 standard deviations of its center
+    reach = int(np.ceil(4 * widths.max()))
+    offsets = np.arange(-reach, reach + 1)
+    columns = np.rint(centers).astype(int)[:, None] + offsets
+    shapes = np.exp(-0.5 * ((columns - centers[:, None]) / widths[:, None]) ** 2) * (widths[0] / widths)[:, None]
+    shapes[(columns < 0) | (columns >= num_samples) | (np.abs(columns - centers[:, None]) > 4 * widths[:, None])] = 0
+    rows = np.broadcast_to(positions[:, None], columns.shape)
+    operator = sparse.csr_matrix(
+        (shapes.ravel(), (rows.ravel(), np.clip(columns, 0, num_samples - 1).ravel())),
+        shape=(seq_len, num_samples),
+    )
+    operator.eliminate_zeros()
+    return operator
+
+def synthesize_traces(
+    fragment_counts: np.ndarray,
+    templates: np.ndarray,
+    samples_per_base: int = 12,
+    peak_width: float = 0.3,
+    width_growth: float = 1.0,
+    mobility_compression: float = 0.2,
+    signal_decay: float = 0.002,
+    noise: float = 0.0,
+    block_size: int = 256,
+    rng: np.random.Generator = None
+) -> np.ndarray:
+    """
+    Turn fragment counts into four-channel capillary electropherogram traces.
+
+    Every fragment terminating at base i fluoresces in the channel of the template base at i.
+    Peak placement, mobility-dependent widening and shape are one sparse operator applied to all
+    templates at once, block_size templates per matrix product.
+
+    Parameters:
+        fragment_counts (np.ndarray): (seq_len,) or (num_templates, seq_len) counts from simulate_sanger / simulate_sanger_batch.
+        templates (np.ndarray): Matching template sequence(s), character or uint8 encoded; a single
+            template is shared by every row of fragment_counts.
+        samples_per_base (int): Trace samples per base at the start of the read.
+        peak_width (float): Peak standard deviation at the start of the read, in bases.
+        width_growth (float): Relative increase of the peak width by the end of the read.
+        mobility_compression (float): Relative decrease of peak spacing by the end of the read.
+        signal_decay (float): Per-base exponential decay of the signal.
+        noise (float): Standard deviation of Gaussian noise, relative to the largest peak.
+        block_size (int): Templates per matrix product.
+        rng (np.random.Generator): Random generator for the noise; a fresh one if None.
+
+    Returns:
+        np.ndarray: (4, num_samples) or (num_templates, 4, num_samples) float32 traces, channels in A, C, G, T order.
+    """
+    single = np.ndim(fragment_counts) == 1 and np.ndim(templates) == 1
+    fragment_counts = np.atleast_2d(fragment_counts)
+    templates = encode_sequence(np.atleast_2d(templates))
+    # One template may serve many count rows (or one count row many templates)
+    try:
+        fragment_counts, templates = np.broadcast_arrays(fragment_counts, templates)
+    except ValueError:
+        raise ValueError(
+            f"fragment_counts {fragment_counts.shape} and templates {templates.shape} must have the same "
+            f"sequence length and either the same number of rows or a single row"
+        ) from None
+    num_templates, seq_len = fragment_counts.shape
+
+    operator = _peak_operator(seq_len, samples_per_base, peak_width, width_growth, mobility_compression)
+    operator_t = operator.T.tocsr()
+    amplitudes = fragment_counts * np.exp(-signal_decay * np.arange(seq_len))
+
+    traces = np.empty((num_templates, 4, operator.shape[1]), dtype=np.float32)
+    for block_start in range(0, num_templates, block_size):
+        block = slice(block_start, block_start + block_size)
+        # (templates * 4 channels, seq_len) amplitude of each base in its own channel
+        channel_amplitudes = (templates[block, None, :] == np.arange(4)[None, :, None]) * amplitudes[block, None, :]
+        block_traces = operator_t @ channel_amplitudes.reshape(-1, seq_len).T
+        traces[block] = block_traces.T.reshape(-1, 4, operator.shape[1])
+
+    if noise > 0:
+        rng = rng or np.random.default_rng()
+        scale = noise * traces.max(axis=(1, 2), keepdims=True)
+        traces += (rng.standard_normal(traces.shape, dtype=np.float32) * scale).astype(np.float32)
+
+    return traces[0] if single else traces
+
 def plot_fragment_counts(fragment_counts, dd_ratio, seq_len):
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
     
     ax.bar(range(1, seq_len + 1), fragment_counts, color="blue", alpha=0.7, edgecolor="black")
     ax.set_xlabel("Fragment Length (Termination Position)")
@@ -72,7 +196,8 @@ def plot_gel_electrophoresis(fragment_counts, seq_len, dd_ratio):
     cmap = mcolors.LinearSegmentedColormap.from_list("custom_cmap", ["black", "deepskyblue", "white"])  
 
     # Plot gel
-    fig, ax = plt.subplots(figsize=(2, 5))
+    fig = Figure(figsize=(2, 5))
+    ax = fig.subplots()
     ax.imshow(gel, cmap=cmap, aspect="auto", extent=[0, gel_width, 0, gel_height])
 
     # Formatting for realism
@@ -1,26 +1,198 @@
 import matplotlib
 matplotlib.use('Agg')
 from flask import send_file
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 from mpl_toolkits.mplot3d import Axes3D
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import os.path as pt
 import os
+import re
+import threading
+import time
+import uuid
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 
+def _placeholder_figure():
+    fig = Figure()
+    ax = fig.subplots()
+    ax.text(0.5, 0.5, 'No plot available', horizontalalignment='center', verticalalignment='center')
+    return fig
 
-def save_plot_to_png(plot_object, filename):
-    if plot_object is None:
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, 'No plot available', horizontalalignment='center', verticalalignment='center')
-        plot_object = fig
+PLOTS_DIR = os.path.join('static', 'plots')
+# Rendered PNGs older than this are removed; a page only needs its plot until the browser fetches it
+PLOT_MAX_AGE = 600
+_PLOT_NAME = re.compile(r'.+_[0-9a-f]{32}\.png$')
 
-    plot_filepath = os.path.join('static', 'plots', filename)
-    plot_object.savefig(plot_filepath)
-    plot_png = f"{filename}.png"
+def _write_png(plot_object, filename):
+    """
+    Save to static/plots/<filename>_<uuid>.png through a temporary file. Every render gets its own
+    name, so concurrent requests never overwrite each other's plot or see a partial PNG.
+    """
+    plot_png = f"{filename}_{uuid.uuid4().hex}.png"
+    plot_filepath = os.path.join(PLOTS_DIR, plot_png)
+    temp_filepath = f"{plot_filepath}.tmp"
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+    plot_object.savefig(temp_filepath, format='png')
+    os.replace(temp_filepath, plot_filepath)
     return plot_png
 
+def _remove_old_plots(max_age):
+    """Delete rendered PNGs (and leftover temporary files) older than max_age seconds."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(PLOTS_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = entry.name[:-len('.tmp')] if entry.name.endswith('.tmp') else entry.name
+        if not _PLOT_NAME.match(name):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def _current_rss_mb():
+    """Resident set size of this process right now, in megabytes (None where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+class RendererPool:
+    """
+    Renders figures on a fixed pool of threads.
+
+    Each render is written under a unique name (see _write_png); files older than max_age
+    seconds are swept out at most once every sweep_interval seconds.
+
+    Plot functions build figures with the object-oriented Figure API, so no pyplot state is
+    shared between threads; each figure is saved and then cleared by the pool as soon as it is
+    written. At most max_workers renders run at once and at most max_pending wait behind them;
+    further callers block until a slot frees up.
+    """
+
+    def __init__(self, max_workers=4, max_pending=16, latency_window=1000, max_age=PLOT_MAX_AGE, sweep_interval=60):
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='renderer')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._latency_window = latency_window
+        self._renders = 0
+        self._failures = 0
+        self._in_flight = 0
+
+    def _run(self, build, filename, close):
+        start = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        plot_object = None
+        try:
+            plot_object = build()
+            if plot_object is None:
+                plot_object, close = _placeholder_figure(), True
+            return _write_png(plot_object, filename)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+            raise
+        finally:
+            if close and plot_object is not None:
+                plot_object.clear()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._renders += 1
+                self._latencies.append(elapsed)
+                del self._latencies[:-self._latency_window]
+
+    def _sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        _remove_old_plots(self.max_age)
+
+    def _submit(self, build, filename, close):
+        with self._slots:
+            plot_png = self._executor.submit(self._run, build, filename, close).result()
+        self._sweep()
+        return plot_png
+
+    def render(self, plot_function, filename, *args, **kwargs):
+        """
+        Build a figure with plot_function(*args, **kwargs) on a renderer thread, save it as
+        static/plots/<filename>_<uuid>.png and close it.
+
+        Returns:
+            str: name of the PNG file
+        """
+        return self._submit(lambda: plot_function(*args, **kwargs), filename, close=True)
+
+    def save(self, plot_object, filename, close=True):
+        """
+        Save an existing figure on a renderer thread. Pass close=False for figures that are
+        kept and updated between requests; the caller must then stop other threads from
+        touching the figure until this returns.
+
+        Returns:
+            str: name of the PNG file
+        """
+        return self._submit(lambda: plot_object, filename, close)
+
+    def stats(self):
+        """
+        Render counts, latency (seconds, over the most recent renders) and process memory.
+
+        Returns:
+            dict: renders, failures, in_flight, max_workers, latency_mean, latency_p95,
+                  latency_max, rss_mb (current) and peak_rss_mb (None where unavailable)
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            renders, failures, in_flight = self._renders, self._failures, self._in_flight
+
+        peak_rss_mb = None
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return {
+            'renders': renders,
+            'failures': failures,
+            'in_flight': in_flight,
+            'max_workers': self.max_workers,
+            'latency_mean': float(latencies.mean()) if len(latencies) else None,
+            'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'latency_max': float(latencies.max()) if len(latencies) else None,
+            'rss_mb': _current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+renderer_pool = RendererPool(max_workers=int(os.environ.get('RENDER_WORKERS', 4)))
+
+
+def save_plot_to_png(plot_object, filename, close=True):
+    return renderer_pool.save(plot_object, filename, close)
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file